@@ -0,0 +1,115 @@
+"""
+Fixtures compartidos para la suite de tests de Kiosco Manager
+"""
+
+import json
+import logging
+import os
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from database import Database, MEMORY_PATH
+
+
+class _ResultadosJSON:
+    """Vuelca los resultados a un JSON después de cada test, reemplazando el archivo de forma atómica"""
+
+    def __init__(self, path):
+        self.path = path
+        self.resumen = {'passed': 0, 'failed': 0, 'skipped': 0}
+        # Por nodeid: un test que pasa en "call" y falla en teardown queda una sola vez, como fallido
+        self.resultados = {}
+
+    def pytest_runtest_logreport(self, report):
+        # Un resultado por test: la fase "call", o setup/teardown si fallaron o se saltearon
+        if report.when != 'call' and report.passed:
+            return
+        previo = self.resultados.get(report.nodeid)
+        if previo is not None:
+            # Solo una falla posterior reemplaza el resultado ya registrado
+            if not report.failed:
+                return
+            self.resumen[previo['resultado']] -= 1
+        self.resumen[report.outcome] += 1
+        self.resultados[report.nodeid] = {
+            'test': report.nodeid,
+            'resultado': report.outcome,
+            'fase': report.when,
+            'error': str(report.longrepr) if report.failed else None,
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'resumen': self.resumen, 'resultados': list(self.resultados.values())}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--results-json", metavar="PATH", default=None,
+        help="escribir el resultado de cada test en PATH a medida que terminan"
+    )
+
+
+def pytest_configure(config):
+    # database.py loguea cada alta en INFO; en los tests solo interesan advertencias y errores
+    logging.getLogger("database").setLevel(logging.WARNING)
+    # Lo registra pytest-xdist; se declara también para correr sin el plugin
+    config.addinivalue_line("markers", "xdist_group(name): tests que deben correr en el mismo worker")
+    path = config.getoption("--results-json")
+    # Con xdist los workers reenvían sus reportes al controlador: solo él escribe
+    if path and not hasattr(config, "workerinput"):
+        config.pluginmanager.register(_ResultadosJSON(path), "resultados_json")
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_xdist_auto_num_workers(config):
+    """Con -n auto deja dos núcleos libres para el proceso principal y el sistema"""
+    return max(1, (os.cpu_count() or 1) - 2)
+
+
+@pytest.fixture(scope="session")
+def _plantilla():
+    """Base en memoria con el esquema ya creado, una por proceso (cada worker de xdist tiene la suya)"""
+    database = Database(path=MEMORY_PATH, testing=True)
+    yield database
+    database.close()
+
+
+@pytest.fixture
+def db(_plantilla):
+    """Copia nueva de la plantilla para cada test; backup() copia páginas en vez de volver a correr el DDL"""
+    conn = sqlite3.connect(MEMORY_PATH, check_same_thread=False)
+    _plantilla.read_conn.backup(conn)
+    database = Database(connection=conn, testing=True, init_schema=False)
+    yield database
+    database.close()
+
+
+@pytest.fixture(scope="session")
+def ahora():
+    """Fecha y hora fija para los datos de prueba: los resultados no dependen de cuándo se corre"""
+    return datetime(2025, 1, 15, 12, 0, 0)
+
+
+@pytest.fixture
+def db_con_ventas(db, ahora):
+    """Base de datos con dos ventas registradas en la fecha fija"""
+    db.bulk_agregar_ventas([
+        (1500.50, "Efectivo", "Test Cliente", "Venta de prueba", ahora),
+        (500, "Transferencia", "", "", ahora),
+    ])
+    return db
+
+
+@pytest.fixture
+def db_con_mes(db, ahora):
+    """Base de datos con 10 ventas por día en los primeros 28 días del mes de la fecha fija"""
+    formas_pago = ("Efectivo", "Transferencia", "Débito", "Crédito", "QR")
+    db.bulk_agregar_ventas([
+        (100 + i, formas_pago[i % len(formas_pago)], "", "", ahora.replace(day=dia, hour=9 + i))
+        for dia in range(1, 29)
+        for i in range(10)
+    ])
+    return db
@@ -5,8 +5,12 @@ Optimized with SQLite best practices following Database Design Expert guidelines
 
 import sqlite3
 import os
+import json
 import logging
 import shutil
+import threading
+import time
+import functools
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Optional, List, Dict, Tuple, Any
@@ -46,10 +50,11 @@ class Venta:
     forma_pago: str
     cliente: Optional[str]
     nota: Optional[str]
-    fecha_hora: datetime
+    fecha_hora: Optional[datetime]
     
     def __post_init__(self):
-        if self.monto <= 0:
+        # "not > 0" also rejects NaN, which compares false against everything
+        if not isinstance(self.monto, (int, float)) or not self.monto > 0:
             raise ValueError("El monto debe ser mayor a 0")
         if self.forma_pago not in [fp.value for fp in FormaPago]:
             raise ValueError(f"Forma de pago inválida: {self.forma_pago}")
@@ -77,19 +82,80 @@ class DatabaseError(Exception):
     pass
 
 
+# Seconds an aggregate result may be reused when no write happened in between
+# (covers writes made by another process on the same file)
+_CACHE_TTL = 2.0
+# Most aggregate results kept at once; the oldest stored entry is dropped first
+_CACHE_MAXSIZE = 8
+
+
+def _cached_query(method):
+    """Reuse an aggregate query result until the next write or for _CACHE_TTL seconds (at most _CACHE_MAXSIZE kept)"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        # Today's date is part of the key so defaulted dates roll over at midnight
+        key = (method.__name__, args, tuple(sorted(kwargs.items())), datetime.now().strftime('%Y-%m-%d'))
+        now = time.monotonic()
+        entry = self._query_cache.get(key)
+        if entry is not None and entry[0] == self._write_gen and now - entry[1] < _CACHE_TTL:
+            return entry[2]
+        result = method(self, *args, **kwargs)
+        # Re-insert so a refreshed key counts as newest in the dict's insertion order
+        self._query_cache.pop(key, None)
+        self._query_cache[key] = (self._write_gen, now, result)
+        if len(self._query_cache) > _CACHE_MAXSIZE:
+            del self._query_cache[next(iter(self._query_cache))]
+        return result
+    return wrapper
+
+
+# Pass as path to keep the whole database in RAM (used by the test suite)
+MEMORY_PATH = ':memory:'
+
+# Applied instead of WAL when Database(testing=True): throwaway databases need no durability.
+# locking_mode=EXCLUSIVE is left out because reads and writes use separate connections
+_TESTING_PRAGMAS = (
+    "PRAGMA journal_mode = MEMORY",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA temp_store = MEMORY",
+)
+
+
 class Database:
     """
     Database manager with connection pooling, transactions, and optimization
     Following SQLite Database Expert best practices
     """
     
-    def __init__(self):
-        self.db_path = self._get_db_path()
+    def __init__(self, path=None, testing: bool = False, connection: Optional[sqlite3.Connection] = None,
+                 init_schema: bool = True):
+        self.testing = testing
+        if path is None:
+            path = MEMORY_PATH if connection is not None else self._get_db_path()
+        self.db_path = Path(path)
         self.backup_dir = self.db_path.parent / 'backups'
-        self._init_database()
+        # An in-memory database lives only as long as its connection, and a connection
+        # handed in by the caller is the database itself: in both cases every
+        # operation shares the long-lived one instead of opening its own
+        self._in_memory = connection is not None or str(self.db_path) == MEMORY_PATH
+        self._read_conn = None
+        if connection is not None:
+            connection.isolation_level = None
+            self._read_conn = self._prepare_read_connection(connection)
+        # Holds the connection of an open transaction() block, per thread
+        self._local = threading.local()
+        self._write_gen = 0
+        self._query_cache = {}
+        # A connection that already holds the schema (e.g. a backup() copy) skips the DDL
+        if init_schema:
+            self._init_database()
     
     def _get_db_path(self) -> Path:
-        """Get database path following OS conventions"""
+        """Get database path following OS conventions; KIOSCO_DB_PATH overrides it"""
+        env_path = os.environ.get('KIOSCO_DB_PATH')
+        if env_path:
+            return Path(env_path)
+        
         if os.name == 'nt':
             db_dir = Path(os.environ.get('LOCALAPPDATA', Path.home())) / 'KioscoManager'
         else:
@@ -105,25 +171,113 @@ class Database:
         Ensures proper connection handling and automatic commit/rollback
         """
         conn = None
+        owned = False
         try:
-            conn = sqlite3.connect(
-                str(self.db_path),
-                timeout=30.0,  # Wait up to 30 seconds for locks
-                isolation_level=None  # Autocommit mode for simplicity
-            )
-            conn.row_factory = sqlite3.Row  # Enable column access by name
-            conn.execute("PRAGMA foreign_keys = ON")  # Enforce foreign keys
-            conn.execute("PRAGMA journal_mode = WAL")  # Write-Ahead Logging for better concurrency
+            conn = getattr(self._local, 'conn', None)
+            if conn is None and self._in_memory:
+                conn = self._get_read_connection()
+            if conn is None:
+                conn = sqlite3.connect(
+                    str(self.db_path),
+                    timeout=30.0,  # Wait up to 30 seconds for locks
+                    isolation_level=None  # Autocommit mode for simplicity
+                )
+                owned = True
+                conn.row_factory = sqlite3.Row  # Enable column access by name
+                conn.execute("PRAGMA foreign_keys = ON")  # Enforce foreign keys
+                if self.testing:
+                    self._apply_testing_pragmas(conn)
+                else:
+                    conn.execute("PRAGMA journal_mode = WAL")  # Write-Ahead Logging for better concurrency
             yield conn
         except sqlite3.Error as e:
             logger.error(f"Database error: {e}")
-            if conn:
+            # A shared connection may be inside a caller's transaction;
+            # SQLite already undid the failed statement, so leave the rest alone
+            if owned:
                 conn.rollback()
             raise DatabaseError(f"Error de base de datos: {e}")
         finally:
-            if conn:
+            if owned:
                 conn.close()
     
+    def _get_read_connection(self) -> sqlite3.Connection:
+        """
+        Long-lived connection for read-only report queries
+        Avoids paying connection setup and PRAGMAs on every query
+        """
+        if self._read_conn is None:
+            self._read_conn = self._prepare_read_connection(sqlite3.connect(
+                str(self.db_path),
+                timeout=30.0,
+                isolation_level=None,
+                check_same_thread=False
+            ))
+        return self._read_conn
+    
+    def _prepare_read_connection(self, conn: sqlite3.Connection) -> sqlite3.Connection:
+        """Row factory and PRAGMAs for the long-lived connection"""
+        conn.row_factory = sqlite3.Row
+        if self._in_memory:
+            conn.execute("PRAGMA foreign_keys = ON")
+        if self.testing:
+            self._apply_testing_pragmas(conn)
+        return conn
+    
+    @staticmethod
+    def _apply_testing_pragmas(conn: sqlite3.Connection):
+        """Trade durability for speed on databases that only live for a test run"""
+        for pragma in _TESTING_PRAGMAS:
+            conn.execute(pragma)
+    
+    @property
+    def read_conn(self) -> sqlite3.Connection:
+        """Shared long-lived connection for read-only UI queries"""
+        return self._get_read_connection()
+    
+    def _invalidate_cache(self):
+        """Drop cached aggregate results; called by every write"""
+        self._write_gen += 1
+        self._query_cache.clear()
+    
+    @contextmanager
+    def _transaction(self, conn):
+        """
+        Atomic block built on a SAVEPOINT: on its own it behaves like BEGIN/COMMIT,
+        inside an already open transaction it only rolls back its own changes
+        """
+        conn.execute("SAVEPOINT kiosco_tx")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK TO kiosco_tx")
+            conn.execute("RELEASE kiosco_tx")
+            # Reads made inside the block may have cached rows that no longer exist
+            self._invalidate_cache()
+            raise
+        conn.execute("RELEASE kiosco_tx")
+        self._invalidate_cache()
+    
+    @contextmanager
+    def transaction(self):
+        """
+        Group several writes into a single commit
+        Writes made on this thread inside the block share its connection; an exception rolls all of them back
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            with self._transaction(conn):
+                yield conn
+            return
+        
+        with self._get_connection() as conn:
+            self._local.conn = conn
+            try:
+                with self._transaction(conn):
+                    yield conn
+            finally:
+                self._local.conn = None
+    
     def _check_table_schema(self, conn, table_name, expected_columns):
         """Check if table exists and has the expected columns"""
         cursor = conn.cursor()
@@ -144,9 +298,10 @@ class Database:
                 cursor.execute("PRAGMA table_info(ventas)")
                 columns = [row[1] for row in cursor.fetchall()]
                 if 'forma_pago' in columns:
-                    # Check if QR is allowed
-                    cursor.execute("SELECT forma_pago FROM ventas WHERE forma_pago = 'QR' LIMIT 1")
-                    if not cursor.fetchone():
+                    # Check if QR is allowed by the table's CHECK constraint (not whether a QR sale exists,
+                    # which rebuilt the table on every start until the first QR sale)
+                    cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'ventas'")
+                    if "'QR'" not in cursor.fetchone()['sql']:
                         # Recreate table with QR support
                         cursor.execute("ALTER TABLE ventas RENAME TO ventas_old")
                         cursor.execute('''
@@ -272,6 +427,11 @@ class Database:
                 ON fiados(cliente_id)
             ''')
             
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_fiados_cliente_estado 
+                ON fiados(cliente_id, estado)
+            ''')
+            
             # Create triggers for automatic updates
             cursor.execute('''
                 CREATE TRIGGER IF NOT EXISTS update_fiado_timestamp 
@@ -336,9 +496,11 @@ class Database:
             logger.error(f"Error durante la migración: {e}")
             raise DatabaseError(f"Error al migrar base de datos: {e}")
     
-    def agregar_venta(self, monto: float, forma_pago: str, cliente: str = "", nota: str = "") -> Optional[int]:
+    def agregar_venta(self, monto: float, forma_pago: str, cliente: str = "", nota: str = "",
+                      fecha_hora: Optional[datetime] = None) -> Optional[int]:
         """
         Add a new sale with transaction safety
+        fecha_hora defaults to the current local time
         Returns: The ID of the newly created venta
         """
         try:
@@ -348,17 +510,19 @@ class Database:
                 forma_pago=forma_pago,
                 cliente=cliente if cliente else None,
                 nota=nota if nota else None,
-                fecha_hora=datetime.now()
+                fecha_hora=fecha_hora
             )
             
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                # Usar datetime('now', 'localtime') para hora local
+                # Sin fecha explícita, usar datetime('now', 'localtime') para hora local
                 cursor.execute('''
                     INSERT INTO ventas (monto, forma_pago, cliente, nota, fecha_hora)
-                    VALUES (?, ?, ?, ?, datetime('now', 'localtime'))
-                ''', (venta.monto, venta.forma_pago, venta.cliente, venta.nota))
+                    VALUES (?, ?, ?, ?, COALESCE(?, datetime('now', 'localtime')))
+                ''', (venta.monto, venta.forma_pago, venta.cliente, venta.nota,
+                      fecha_hora.strftime('%Y-%m-%d %H:%M:%S') if fecha_hora else None))
                 
+                self._invalidate_cache()
                 venta_id = cursor.lastrowid
                 logger.info(f"Venta registrada: ID={venta_id}, Monto=${monto}, Pago={forma_pago}")
                 return venta_id
@@ -369,7 +533,34 @@ class Database:
         except Exception as e:
             logger.error(f"Error al agregar venta: {e}")
             raise DatabaseError(f"No se pudo registrar la venta: {e}")
-    
+
+    def bulk_agregar_ventas(self, rows: List[Tuple]) -> int:
+        """
+        Add many sales with one executemany inside a single transaction
+        rows: (monto, forma_pago, cliente, nota, fecha_hora) tuples; a None fecha_hora means now
+        Returns: The number of ventas inserted
+        """
+        params = []
+        for monto, forma_pago, cliente, nota, fecha_hora in rows:
+            venta = Venta(None, monto, forma_pago, cliente or None, nota or None, fecha_hora)
+            if isinstance(fecha_hora, datetime):
+                fecha_hora = fecha_hora.strftime('%Y-%m-%d %H:%M:%S')
+            params.append((venta.monto, venta.forma_pago, venta.cliente, venta.nota, fecha_hora))
+
+        try:
+            with self._get_connection() as conn, self._transaction(conn):
+                conn.executemany('''
+                    INSERT INTO ventas (monto, forma_pago, cliente, nota, fecha_hora)
+                    VALUES (?, ?, ?, ?, COALESCE(?, datetime('now', 'localtime')))
+                ''', params)
+
+            logger.info(f"Ventas registradas en lote: {len(params)}")
+            return len(params)
+
+        except Exception as e:
+            logger.error(f"Error al agregar ventas en lote: {e}")
+            raise DatabaseError(f"No se pudieron registrar las ventas: {e}")
+
     def modificar_venta(self, venta_id: int, monto: float, forma_pago: str, cliente: str = "", nota: str = "") -> bool:
         """
         Modify an existing sale
@@ -387,6 +578,7 @@ class Database:
                 if cursor.rowcount == 0:
                     raise DatabaseError(f"Venta con ID {venta_id} no encontrada")
                 
+                self._invalidate_cache()
                 logger.info(f"Venta modificada: ID={venta_id}, Monto=${monto}, Pago={forma_pago}")
                 return True
                 
@@ -407,6 +599,7 @@ class Database:
                 if cursor.rowcount == 0:
                     raise DatabaseError(f"Venta con ID {venta_id} no encontrada")
                 
+                self._invalidate_cache()
                 logger.info(f"Venta eliminada: ID={venta_id}")
                 return True
                 
@@ -462,6 +655,7 @@ class Database:
                 'por_forma_pago': por_forma_pago
             }
     
+    @_cached_query
     def obtener_resumen_diario(self, fecha: Optional[str] = None) -> Dict[str, Any]:
         """Get daily summary with statistics and shift breakdown"""
         if fecha is None:
@@ -503,6 +697,7 @@ class Database:
         
         return datos
     
+    @_cached_query
     def obtener_resumen_mensual(self, anio: Optional[int] = None, mes: Optional[int] = None) -> Dict[str, Any]:
         """
         Get monthly summary with daily breakdown
@@ -517,15 +712,6 @@ class Database:
         with self._get_connection() as conn:
             cursor = conn.cursor()
             
-            # Total for the month
-            cursor.execute('''
-                SELECT COUNT(*), SUM(monto), AVG(monto)
-                FROM ventas 
-                WHERE strftime('%Y-%m', fecha_hora) = ?
-            ''', (mes_str,))
-            
-            total_stats = cursor.fetchone()
-            
             # By payment method
             cursor.execute('''
                 SELECT forma_pago, COUNT(*) as cantidad, SUM(monto) as total
@@ -554,16 +740,58 @@ class Database:
             ''', (mes_str,))
             
             por_dia = cursor.fetchall()
+        
+        # Month totals accumulated from the daily rows
+        total = sum(dia['total'] for dia in por_dia)
+        cantidad = sum(dia['cantidad'] for dia in por_dia)
+        
+        return {
+            'anio': anio,
+            'mes': mes,
+            'total': total,
+            'cantidad': cantidad,
+            'promedio': total / cantidad if cantidad else 0,
+            'por_forma_pago': por_forma_pago,
+            'por_dia': por_dia
+        }
+    
+    def obtener_resumen_anual(self, anio: int) -> Dict[str, Any]:
+        """
+        Get yearly summary with monthly breakdown
+        Year totals are derived from the monthly rows, so this is a single query
+        """
+        try:
+            cursor = self._get_read_connection().cursor()
+            cursor.execute('''
+                SELECT 
+                    strftime('%m', fecha_hora) as mes,
+                    COUNT(*) as cantidad,
+                    SUM(monto) as total,
+                    SUM(CASE WHEN forma_pago = 'Efectivo' THEN monto ELSE 0 END) as efectivo,
+                    SUM(CASE WHEN forma_pago = 'Transferencia' THEN monto ELSE 0 END) as transferencia,
+                    SUM(CASE WHEN forma_pago = 'Débito' THEN monto ELSE 0 END) as debito,
+                    SUM(CASE WHEN forma_pago = 'Crédito' THEN monto ELSE 0 END) as credito
+                FROM ventas 
+                WHERE strftime('%Y', fecha_hora) = ?
+                GROUP BY mes
+                ORDER BY mes
+            ''', (f"{anio:04d}",))
             
-            return {
-                'anio': anio,
-                'mes': mes,
-                'total': total_stats['SUM(monto)'] or 0,
-                'cantidad': total_stats['COUNT(*)'] or 0,
-                'promedio': total_stats['AVG(monto)'] or 0,
-                'por_forma_pago': por_forma_pago,
-                'por_dia': por_dia
-            }
+            por_mes = cursor.fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Database error: {e}")
+            raise DatabaseError(f"Error de base de datos: {e}")
+        
+        total = sum(m['total'] for m in por_mes)
+        cantidad = sum(m['cantidad'] for m in por_mes)
+        
+        return {
+            'anio': anio,
+            'total': total,
+            'cantidad': cantidad,
+            'promedio': total / cantidad if cantidad else 0,
+            'por_mes': por_mes
+        }
     
     def agregar_cliente(self, nombre: str, telefono: str = "", email: str = "", direccion: str = "", notas: str = "") -> Optional[int]:
         """Add a new client to the database"""
@@ -576,6 +804,7 @@ class Database:
                 ''', (nombre.strip(), telefono.strip() or None, email.strip() or None, 
                       direccion.strip() or None, notas.strip() or None))
                 
+                self._invalidate_cache()
                 cliente_id = cursor.lastrowid
                 logger.info(f"Cliente registrado: ID={cliente_id}, Nombre={nombre}")
                 return cliente_id
@@ -613,6 +842,13 @@ class Database:
             ''', (nombre.strip(),))
             return cursor.fetchone()
     
+    def existe_cliente(self, nombre: str) -> bool:
+        """Check whether a client name is taken (inactive clients count, the name is UNIQUE)"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT 1 FROM clientes WHERE nombre = ? LIMIT 1', (nombre.strip(),))
+            return cursor.fetchone() is not None
+    
     def agregar_fiado(self, cliente_id: int, cliente_nombre: str, monto: float, interes: float = 0, nota: str = "") -> Optional[int]:
         """Add a new fiado with calculated totals and client reference"""
         try:
@@ -629,6 +865,7 @@ class Database:
                 ''', (cliente_id, cliente_nombre.strip(), monto, interes, monto_total, saldo_pendiente, 
                       nota if nota else None))
                 
+                self._invalidate_cache()
                 fiado_id = cursor.lastrowid
                 logger.info(f"Fiado registrado: ID={fiado_id}, Cliente={cliente_nombre}, MontoTotal=${monto_total}")
                 return fiado_id
@@ -643,10 +880,7 @@ class Database:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
                 
-                # Start transaction
-                conn.execute("BEGIN TRANSACTION")
-                
-                try:
+                with self._transaction(conn):
                     # Get current fiado state
                     cursor.execute('''
                         SELECT monto_total, monto_pagado, saldo_pendiente, estado, cliente_nombre
@@ -690,8 +924,6 @@ class Database:
                         WHERE id = ?
                     ''', (nuevo_pagado, nuevo_saldo, nuevo_estado, fecha_pago, fiado_id))
                     
-                    conn.execute("COMMIT")
-                    
                     result = {
                         'pago_id': pago_id,
                         'fiado_id': fiado_id,
@@ -707,10 +939,6 @@ class Database:
                     logger.info(f"Pago registrado: Fiado ID={fiado_id}, Monto=${monto}, Saldo=${nuevo_saldo}")
                     return result
                     
-                except Exception as e:
-                    conn.execute("ROLLBACK")
-                    raise e
-                    
         except Exception as e:
             logger.error(f"Error al registrar pago: {e}")
             raise DatabaseError(f"No se pudo registrar el pago: {e}")
@@ -745,6 +973,7 @@ class Database:
                 ''', (monto_original, monto, monto - monto_pagado, interes_porcentaje, 
                       nota if nota else None, fiado_id))
                 
+                self._invalidate_cache()
                 logger.info(f"Fiado modificado: ID={fiado_id}, Monto=${monto}")
                 return True
                 
@@ -772,6 +1001,7 @@ class Database:
                 
                 cursor.execute('DELETE FROM fiados WHERE id = ?', (fiado_id,))
                 
+                self._invalidate_cache()
                 logger.info(f"Fiado eliminado: ID={fiado_id}")
                 return True
                 
@@ -779,8 +1009,9 @@ class Database:
             logger.error(f"Error al eliminar fiado: {e}")
             raise DatabaseError(f"No se pudo eliminar el fiado: {e}")
     
-    def obtener_fiados(self, estado: Optional[str] = None, cliente_id: Optional[int] = None) -> List[sqlite3.Row]:
-        """Get fiados with optional filters"""
+    def obtener_fiados(self, estado: Optional[str] = None, cliente_id: Optional[int] = None,
+                       solo_pendientes: bool = False) -> List[sqlite3.Row]:
+        """Get fiados with optional filters; solo_pendientes keeps only 'Pendiente' and 'Parcial'"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
             
@@ -804,11 +1035,32 @@ class Database:
                 query += " AND f.cliente_id = ?"
                 params.append(cliente_id)
             
+            if solo_pendientes:
+                query += " AND f.estado IN ('Pendiente', 'Parcial')"
+            
             query += " ORDER BY f.fecha_creacion DESC"
             
             cursor.execute(query, params)
             return cursor.fetchall()
     
+    def obtener_fiado(self, fiado_id: int) -> Optional[sqlite3.Row]:
+        """Get a single fiado by its primary key"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM fiados WHERE id = ?', (fiado_id,))
+            return cursor.fetchone()
+    
+    def obtener_saldo_pendiente_cliente(self, cliente_id: int) -> float:
+        """Get a client's total pending balance (served by idx_fiados_cliente_estado)"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT COALESCE(SUM(saldo_pendiente), 0)
+                FROM fiados
+                WHERE cliente_id = ? AND estado IN ('Pendiente', 'Parcial')
+            ''', (cliente_id,))
+            return cursor.fetchone()[0]
+    
     def obtener_fiados_por_cliente(self, cliente_id: int) -> List[sqlite3.Row]:
         """Get all fiados for a specific client with payment summary"""
         with self._get_connection() as conn:
@@ -885,6 +1137,7 @@ class Database:
                 'cantidad_pagos': len(pagos)
             }
     
+    @_cached_query
     def obtener_estadisticas_fiados(self) -> Dict[str, Any]:
         """Get fiado statistics"""
         with self._get_connection() as conn:
@@ -975,6 +1228,65 @@ class Database:
                 'fiados': fiados
             }
     
+    def exportar_a_json_stream(self, fp, fecha_inicio: Optional[str] = None, fecha_fin: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Write the same export as exportar_a_json to a text file object, row by row
+        Rows are never held in memory all at once; 'resumen' is written last since
+        its totals are only known after streaming. Returns the resumen.
+        """
+        ventas_query = "SELECT * FROM ventas"
+        ventas_params = []
+        
+        if fecha_inicio and fecha_fin:
+            ventas_query += " WHERE date(fecha_hora) BETWEEN ? AND ?"
+            ventas_params = [fecha_inicio, fecha_fin]
+        
+        ventas_query += " ORDER BY fecha_hora DESC"
+        
+        def escribir_filas(cursor, campo_suma=None):
+            cantidad = 0
+            suma = 0
+            for row in cursor:
+                fp.write(',\n    ' if cantidad else '\n    ')
+                fp.write(json.dumps(dict(row), ensure_ascii=False))
+                cantidad += 1
+                if campo_suma:
+                    suma += row[campo_suma]
+            fp.write('\n  ]' if cantidad else ']')
+            return cantidad, suma
+        
+        with self._get_connection() as conn:
+            # One read transaction so ventas, fiados and the totals come from the same snapshot,
+            # even while the UI keeps committing sales on other connections
+            propia = not conn.in_transaction
+            if propia:
+                conn.execute("BEGIN")
+            try:
+                fp.write('{\n')
+                fp.write(f'  "exportado_el": {json.dumps(datetime.now().isoformat())},\n')
+                fp.write(f'  "periodo": {json.dumps({"inicio": fecha_inicio, "fin": fecha_fin})},\n')
+                
+                fp.write('  "ventas": [')
+                total_ventas, monto_total = escribir_filas(conn.execute(ventas_query, ventas_params), 'monto')
+                fp.write(',\n')
+                
+                fp.write('  "fiados": [')
+                total_fiados, _ = escribir_filas(conn.execute("SELECT * FROM fiados ORDER BY fecha_creacion DESC"))
+                fp.write(',\n')
+            finally:
+                if propia:
+                    conn.execute("COMMIT")
+            
+            resumen = {
+                'total_ventas': total_ventas,
+                'total_fiados': total_fiados,
+                'monto_total_ventas': monto_total
+            }
+            fp.write(f'  "resumen": {json.dumps(resumen, ensure_ascii=False)}\n')
+            fp.write('}\n')
+        
+        return resumen
+    
     def obtener_historial_fiado(self, fiado_id: int) -> List[sqlite3.Row]:
         """Get payment history for a specific fiado"""
         with self._get_connection() as conn:
@@ -1091,10 +1403,7 @@ class Database:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
                 
-                # Start transaction
-                conn.execute("BEGIN TRANSACTION")
-                
-                try:
+                with self._transaction(conn):
                     # Get all pending/partial fiados for client
                     cursor.execute('''
                         SELECT id, monto_original, interes_porcentaje, monto_total, saldo_pendiente, estado
@@ -1137,8 +1446,6 @@ class Database:
                             'saldo_nuevo': nuevo_saldo
                         })
                     
-                    conn.execute("COMMIT")
-                    
                     logger.info(f"Interés aplicado a {len(fiados_actualizados)} fiados del cliente {cliente_id}")
                     
                     return {
@@ -1149,10 +1456,6 @@ class Database:
                         'detalle': fiados_actualizados
                     }
                     
-                except Exception as e:
-                    conn.execute("ROLLBACK")
-                    raise e
-                    
         except Exception as e:
             logger.error(f"Error al aplicar interés: {e}")
             raise DatabaseError(f"No se pudo aplicar el interés: {e}")
@@ -1163,10 +1466,7 @@ class Database:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
                 
-                # Start transaction
-                conn.execute("BEGIN TRANSACTION")
-                
-                try:
+                with self._transaction(conn):
                     # Get all pending/partial fiados for client
                     cursor.execute('''
                         SELECT id, saldo_pendiente, estado, cliente_nombre
@@ -1209,8 +1509,6 @@ class Database:
                             'estado_anterior': fiado['estado']
                         })
                     
-                    conn.execute("COMMIT")
-                    
                     logger.info(f"Pagados {len(fiados_pagados)} fiados del cliente {cliente_id}")
                     
                     return {
@@ -1221,14 +1519,13 @@ class Database:
                         'fiados_pagados': fiados_pagados
                     }
                     
-                except Exception as e:
-                    conn.execute("ROLLBACK")
-                    raise e
-                    
         except Exception as e:
             logger.error(f"Error al pagar fiados: {e}")
             raise DatabaseError(f"No se pudo realizar el pago: {e}")
     
     def close(self):
-        """Cleanup method - currently connections are managed by context managers"""
+        """Close the long-lived read connection; other connections are managed by context managers"""
+        if self._read_conn is not None:
+            self._read_conn.close()
+            self._read_conn = None
         logger.info("Database connection manager closed")
@@ -7,8 +7,11 @@ Simple, clear, and intuitive interface for non-technical users
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog, filedialog
 from datetime import datetime, timedelta
-import json
 import logging
+import os
+import re
+import threading
+from operator import itemgetter
 from typing import Optional
 from pathlib import Path
 
@@ -21,6 +24,41 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Row field extractors for the tree population loops
+_CAMPOS_PAGO = itemgetter('fecha_pago', 'monto', 'nota')
+_CAMPOS_VENTA = itemgetter('fecha_hora', 'monto', 'forma_pago', 'cliente', 'nota')
+
+# Fiado status values compared per row
+_ESTADO_PAGADO = EstadoFiado.PAGADO.value
+_ESTADO_PARCIAL = EstadoFiado.PARCIAL.value
+
+# Plain money/percentage formatters for the table populate loops
+_FMT_MONEY = "${:.2f}".format
+_FMT_PCT = "{}%".format
+
+# Input format checks shared by the search tabs
+_YEAR_RE = re.compile(r'\d{4}')
+_DATE_RE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+# Yearly search table layout
+_NOMBRES_MESES = {
+    '01': 'Enero', '02': 'Febrero', '03': 'Marzo', '04': 'Abril',
+    '05': 'Mayo', '06': 'Junio', '07': 'Julio', '08': 'Agosto',
+    '09': 'Septiembre', '10': 'Octubre', '11': 'Noviembre', '12': 'Diciembre'
+}
+_COLUMNAS_ANIO = ('mes', 'cantidad', 'total', 'efectivo', 'transferencia', 'debito', 'credito')
+_HEADERS_ANIO = {'mes': 'Mes', 'cantidad': 'Ventas', 'total': 'Total',
+                 'efectivo': 'Efectivo', 'transferencia': 'Transf.', 'debito': 'Débito', 'credito': 'Crédito'}
+
+# Pending/partial fiados list; fixed strings so sqlite3's statement cache hits
+_SQL_FIADOS_ABIERTOS = '''
+    SELECT f.*
+    FROM fiados f
+    WHERE f.estado IN ('Pendiente', 'Parcial')
+'''
+_SQL_FIADOS_ABIERTOS_TODOS = _SQL_FIADOS_ABIERTOS + " ORDER BY f.fecha_creacion DESC"
+_SQL_FIADOS_ABIERTOS_CLIENTE = _SQL_FIADOS_ABIERTOS + " AND f.cliente_id = ? ORDER BY f.fecha_creacion DESC"
+
 
 # Color scheme - Paleta atractiva en modo claro
 class Colors:
@@ -179,6 +217,17 @@ class KioscoApp:
                   foreground=[('selected', 'white')])
         
         style.configure("TNotebook.Tab", font=self.font_medium)
+        
+        # Payment method buttons - the focused one is highlighted by Tk itself
+        style.configure("Pago.TButton",
+                        font=self.font_medium,
+                        background=Colors.CARD_BG,
+                        foreground=Colors.TEXT_PRIMARY,
+                        bordercolor=Colors.BORDER,
+                        padding=(15, 8))
+        style.map("Pago.TButton",
+                  background=[('focus', Colors.PRIMARY), ('active', Colors.CARD_BG_ALT)],
+                  foreground=[('focus', 'white')])
     
     def init_variables(self):
         """Initialize Tkinter variables"""
@@ -202,6 +251,32 @@ class KioscoApp:
         # Historial variables
         self.var_historial_cliente_id = tk.IntVar(value=0)
         
+        # Raw data of the rows shown in tree_fiados, keyed by item id
+        self._fiado_saldos = {}
+        self._fiado_meta = {}
+        
+        # Pending (debounced) client balance lookup
+        self._saldo_after_id = None
+        
+        # Client balance cache, invalidated by bumping the version on writes
+        self._saldo_cache = {}
+        self._saldo_version = 0
+        
+        # Last loaded daily summary, kept current by guardar_venta
+        self._resumen_hoy = None
+        self._fecha_resumen_hoy = None
+        self._saldo_fiados_pendiente = 0
+        
+        # Secondary tabs are built on first activation
+        self._tabs_built = set()
+        
+        # Deferred fiado view refresh after bulk operations
+        self._pending_refresh = False
+        self._refresh_total_msg = None
+        
+        # Rows currently shown by diff-synced trees: tree path -> {iid: (values, tag)}
+        self._tree_rows = {}
+        
         # Search variables
         self.var_buscar_fecha = tk.StringVar(value=datetime.now().strftime('%Y-%m-%d'))
         
@@ -315,10 +390,9 @@ class KioscoApp:
         self.notebook.add(self.tab_ventas, text="💰  REGISTRAR VENTA")
         self.create_tab_ventas()
         
-        # Tab 2: Reports
+        # Tab 2: Reports (built on first visit)
         self.tab_reportes = tk.Frame(self.notebook, bg=Colors.BACKGROUND)
         self.notebook.add(self.tab_reportes, text="📊  REPORTES")
-        self.create_tab_reportes()
         
         # Tab 3: Fiados
         self.tab_fiados = tk.Frame(self.notebook, bg=Colors.BACKGROUND)
@@ -797,6 +871,11 @@ class KioscoApp:
             fg=Colors.TEXT_PRIMARY
         ).pack(anchor='w', pady=(0, 5))
         
+        # One reusable label per payment method, created on first use
+        self._pagos_labels_frame = tk.Frame(self.daily_pagos_frame, bg=Colors.CARD_BG)
+        self._pagos_labels_frame.pack(anchor='w')
+        self._pago_labels = {}
+        
         # Sales detail treeview
         self.create_report_treeview(parent, 'daily')
     
@@ -1020,6 +1099,7 @@ class KioscoApp:
         # Tab 1: Nuevo Fiado
         tab_nuevo = tk.Frame(self.fiados_notebook, bg=Colors.BACKGROUND)
         self.fiados_notebook.add(tab_nuevo, text="➕ Nuevo Fiado")
+        self._nuevo_fiado_tab_idx = self.fiados_notebook.index(tab_nuevo)
         self.create_tab_nuevo_fiado(tab_nuevo)
         
         # Tab 2: Lista de Fiados
@@ -1027,10 +1107,9 @@ class KioscoApp:
         self.fiados_notebook.add(tab_lista, text="📋 Lista de Fiados")
         self.create_tab_lista_fiados(tab_lista)
         
-        # Tab 3: Historial de Pagos
-        tab_historial = tk.Frame(self.fiados_notebook, bg=Colors.BACKGROUND)
-        self.fiados_notebook.add(tab_historial, text="📜 Historial de Pagos")
-        self.create_tab_historial_pagos(tab_historial)
+        # Tab 3: Historial de Pagos (built on first visit)
+        self.tab_historial_pagos = tk.Frame(self.fiados_notebook, bg=Colors.BACKGROUND)
+        self.fiados_notebook.add(self.tab_historial_pagos, text="📜 Historial de Pagos")
         
         # Evento cuando se cambia de pestaña en fiados
         self.fiados_notebook.bind('<<NotebookTabChanged>>', self.on_fiados_tab_changed)
@@ -1041,7 +1120,9 @@ class KioscoApp:
             current_tab = self.fiados_notebook.select()
             tab_text = self.fiados_notebook.tab(current_tab, "text")
             
-            if tab_text == "➕ Nuevo Fiado":
+            if str(current_tab) == str(self.tab_historial_pagos):
+                self._build_history_tab()
+            elif tab_text == "➕ Nuevo Fiado":
                 # Actualizar saldo del cliente seleccionado
                 cliente_id = self.var_fiado_cliente_id.get()
                 if cliente_id:
@@ -1148,6 +1229,7 @@ class KioscoApp:
                     messagebox.showerror("Error", "El monto debe ser mayor a 0")
                     return
                 self.db.modificar_fiado(int(fiado_id), nuevo)
+                self.invalidar_saldos_clientes()
                 dialog.destroy()
                 self.cargar_fiados()
             except ValueError:
@@ -1179,6 +1261,7 @@ class KioscoApp:
             try:
                 monto = float(values[3].replace('$', '').replace(',', ''))
                 self.db.modificar_fiado(int(fiado_id), monto, nota=var_nota.get())
+                self.invalidar_saldos_clientes()
                 dialog.destroy()
                 self.cargar_fiados()
             except Exception as e:
@@ -1204,6 +1287,7 @@ class KioscoApp:
         if respuesta:
             try:
                 self.db.eliminar_fiado(int(fiado_id))
+                self.invalidar_saldos_clientes()
                 messagebox.showinfo("Éxito", "Fiado eliminado correctamente")
                 self.cargar_fiados()
             except Exception as e:
@@ -1501,6 +1585,10 @@ class KioscoApp:
         self.tree_fiados.column('monto_total', width=130)
         self.tree_fiados.column('saldo', width=130)
         
+        # Status colour tags, configured once
+        self.tree_fiados.tag_configure('pagado', foreground=Colors.SUCCESS)
+        self.tree_fiados.tag_configure('parcial', foreground=Colors.WARNING)
+        
         scrollbar = ttk.Scrollbar(parent, orient='vertical', command=self.tree_fiados.yview)
         self.tree_fiados.configure(yscrollcommand=scrollbar.set)
         
@@ -1625,6 +1713,8 @@ class KioscoApp:
     
     def cargar_clientes_en_combo_historial(self):
         """Load clients into history combobox"""
+        if 'historial' not in self._tabs_built:
+            return
         try:
             clientes = self.db.obtener_clientes()
             self.historial_clientes_dict = {c['nombre']: c['id'] for c in clientes}
@@ -1642,20 +1732,38 @@ class KioscoApp:
                 text=f"Cliente: {nombre}",
                 fg=Colors.SUCCESS
             )
-            # Show pending balance
-            self.actualizar_saldo_cliente(cliente_id)
+            # Show pending balance - coalesce bursts of selections (keyboard
+            # navigation) into a single query
+            if self._saldo_after_id is not None:
+                self.root.after_cancel(self._saldo_after_id)
+            self._saldo_after_id = self.root.after(150, self._actualizar_saldo_diferido, cliente_id)
+    
+    def _actualizar_saldo_diferido(self, cliente_id):
+        """Run the balance lookup scheduled by on_cliente_selected"""
+        self._saldo_after_id = None
+        self.actualizar_saldo_cliente(cliente_id)
     
     def actualizar_saldo_cliente(self, cliente_id):
         """Update client balance display"""
         try:
-            resumen = self.db.obtener_resumen_fiados_cliente(cliente_id)
-            saldo = resumen['resumen_fiados']['saldo_pendiente']
+            key = (cliente_id, self._saldo_version)
+            if key in self._saldo_cache:
+                saldo = self._saldo_cache[key]
+            else:
+                resumen = self.db.obtener_resumen_fiados_cliente(cliente_id)
+                saldo = resumen['resumen_fiados']['saldo_pendiente']
+                self._saldo_cache[key] = saldo
             self.lbl_saldo_cliente.config(
                 text=f"Saldo pendiente total: ${saldo:.2f}"
             )
         except Exception as e:
             self.lbl_saldo_cliente.config(text="Saldo pendiente: $0.00")
     
+    def invalidar_saldos_clientes(self):
+        """Drop cached client balances after any fiado/client write"""
+        self._saldo_version += 1
+        self._saldo_cache.clear()
+    
     def agregar_nuevo_cliente(self):
         """Add new client"""
         nombre = self.var_nuevo_cliente_nombre.get().strip()
@@ -1668,6 +1776,7 @@ class KioscoApp:
         try:
             cliente_id = self.db.agregar_cliente(nombre, telefono)
             if cliente_id:
+                self.invalidar_saldos_clientes()
                 messagebox.showinfo("✅ Éxito", f"Cliente '{nombre}' agregado correctamente")
                 self.var_nuevo_cliente_nombre.set('')
                 self.var_nuevo_cliente_telefono.set('')
@@ -1730,11 +1839,14 @@ class KioscoApp:
         self.lbl_totals.pack(side='right')
     
     def create_tooltip(self, widget, text):
-        """Create tooltip for widget"""
-        def show_tooltip(event):
+        """Create tooltip for widget, shown only after the pointer rests on it"""
+        widget._tooltip_after = None
+        
+        def _actually_show(x, y):
+            widget._tooltip_after = None
             tooltip = tk.Toplevel()
             tooltip.wm_overrideredirect(True)
-            tooltip.wm_geometry(f"+{event.x_root+10}+{event.y_root+10}")
+            tooltip.wm_geometry(f"+{x+10}+{y+10}")
             
             label = tk.Label(
                 tooltip,
@@ -1748,7 +1860,14 @@ class KioscoApp:
             
             widget.tooltip = tooltip
         
+        def show_tooltip(event):
+            if widget._tooltip_after is None and not hasattr(widget, 'tooltip'):
+                widget._tooltip_after = self.root.after(400, _actually_show, event.x_root, event.y_root)
+        
         def hide_tooltip(event):
+            if widget._tooltip_after:
+                self.root.after_cancel(widget._tooltip_after)
+                widget._tooltip_after = None
             if hasattr(widget, 'tooltip'):
                 widget.tooltip.destroy()
                 delattr(widget, 'tooltip')
@@ -1807,8 +1926,8 @@ class KioscoApp:
                 self.var_forma_pago.set(FormaPago.EFECTIVO.value)
                 self.select_payment_method(FormaPago.EFECTIVO.value)
                 
-                # Refresh data
-                self.refresh_all()
+                # Show the new sale without reloading every view
+                self._append_venta_row(venta_id, monto, forma_pago, cliente, nota)
                 
                 # Show success
                 messagebox.showinfo(
@@ -1874,18 +1993,10 @@ class KioscoApp:
         
         for i, forma_pago in enumerate(formas_pago):
             emoji = payment_emojis.get(forma_pago.value, '💵')
-            btn = tk.Button(
+            btn = ttk.Button(
                 btn_frame,
                 text=f"{emoji} {forma_pago.value}",
-                font=self.font_medium,
-                bg=Colors.PRIMARY if i == 0 else Colors.CARD_BG,
-                fg="white",
-                relief='solid',
-                bd=2,
-                highlightbackground=Colors.BORDER,
-                highlightthickness=1,
-                padx=15,
-                pady=8,
+                style='Pago.TButton',
                 cursor="hand2"
             )
             btn.pack(side='left', padx=4, pady=4)
@@ -1911,12 +2022,7 @@ class KioscoApp:
         def update_selection(index):
             nonlocal selected_index
             selected_index = index
-            for i, btn in enumerate(buttons):
-                if i == selected_index:
-                    btn.config(bg=Colors.PRIMARY, fg="white")
-                    btn.focus_set()
-                else:
-                    btn.config(bg=Colors.CARD_BG, fg=Colors.TEXT_PRIMARY)
+            buttons[index].focus_set()
         
         def on_key(event):
             if event.keysym == 'Left':
@@ -1936,13 +2042,18 @@ class KioscoApp:
         # Bind keyboard events
         dialog.bind('<Key>', on_key)
         
-        # Bind click events to buttons
+        def on_focus(index):
+            # Tab also moves focus (and the highlight); keep Enter committing the highlighted option
+            nonlocal selected_index
+            selected_index = index
+        
+        # Bind click and focus events to buttons
         for i, btn in enumerate(buttons):
             btn.config(command=lambda i=i: on_click(i))
+            btn.bind('<FocusIn>', lambda e, i=i: on_focus(i))
         
         # Initial selection and focus
         update_selection(0)
-        buttons[0].focus_set()
         
         # Wait for dialog to close
         dialog.wait_window()
@@ -1988,6 +2099,8 @@ class KioscoApp:
             fiado_id = self.db.agregar_fiado(cliente_id, cliente_nombre, monto, interes, nota)
             
             if fiado_id:
+                self.invalidar_saldos_clientes()
+                
                 # Clear form
                 self.var_fiado_monto.set('')
                 self.var_fiado_interes.set('0')
@@ -2021,22 +2134,8 @@ class KioscoApp:
             messagebox.showwarning("⚠️ Atención", "Por favor seleccione un fiado de la lista")
             return
         
-        item = self.tree_fiados.item(selection[0])
-        fiado_id = int(item['values'][0])
-        cliente_nombre = item['values'][2]
-        saldo_actual = float(item['values'][6].replace('$', '').replace(',', ''))
-        
-        # Get client info from database to find client_id
-        try:
-            # Search for client by name to get ID
-            clientes = self.db.obtener_clientes()
-            cliente_id = None
-            for c in clientes:
-                if c['nombre'] == cliente_nombre:
-                    cliente_id = c['id']
-                    break
-        except:
-            cliente_id = None
+        fiado_id, cliente_id, cliente_nombre = self._fiado_meta[selection[0]]
+        saldo_actual = self._fiado_saldos[selection[0]]
         
         # Show dialog with current balance
         msg = f"Cliente: {cliente_nombre}\nSaldo pendiente: ${saldo_actual:.2f}\n\nIngrese el monto a pagar:"
@@ -2052,6 +2151,8 @@ class KioscoApp:
                 resultado = self.db.registrar_pago_fiado(fiado_id, monto)
                 
                 if resultado:
+                    self.invalidar_saldos_clientes()
+                    
                     # Build success message
                     msg = f"✅ Pago registrado exitosamente!\n\n"
                     msg += f"Monto pagado: ${resultado['monto_pagado']:.2f}\n"
@@ -2097,6 +2198,110 @@ class KioscoApp:
                 messagebox.showerror("❌ Error", str(e))
                 logger.error(f"Error al registrar pago: {e}")
     
+    def _vaciar_tree(self, tree):
+        """Remove every row from a treeview with a single Tcl call"""
+        tree.delete(*tree.get_children())
+        self._tree_rows.pop(str(tree), None)
+    
+    def _sincronizar_tree(self, tree, filas, iids, tags=None):
+        """
+        Bring a treeview in line with filas, touching only rows that changed
+        Rows are matched by iid; removed rows are deleted, changed rows updated
+        in place and new rows batch-inserted, then order is fixed in one call.
+        """
+        previas = self._tree_rows.get(str(tree), {})
+        if tags is None:
+            tags = [''] * len(filas)
+        nuevas = {iid: (tuple(fila), tag) for iid, fila, tag in zip(iids, filas, tags)}
+        
+        eliminadas = [iid for iid in previas if iid not in nuevas]
+        if eliminadas:
+            tree.delete(*eliminadas)
+        
+        alta_filas, alta_iids, alta_tags = [], [], []
+        for iid, (fila, tag) in nuevas.items():
+            previa = previas.get(iid)
+            if previa is None:
+                alta_filas.append(fila)
+                alta_iids.append(iid)
+                alta_tags.append(tag)
+            elif previa != (fila, tag):
+                tree.item(iid, values=fila, tags=(tag,) if tag else ())
+        self._insertar_filas(tree, alta_filas, iids=alta_iids, tags=alta_tags)
+        
+        # Surviving rows keep their place and new ones were appended
+        orden_actual = [iid for iid in previas if iid in nuevas] + alta_iids
+        orden = list(nuevas)
+        if orden_actual != orden:
+            tree.set_children('', *orden)
+        
+        self._tree_rows[str(tree)] = nuevas
+    
+    def _anteponer_fila(self, tree, iid, fila):
+        """Insert a row at the top of a diff-synced treeview"""
+        tree.insert('', 0, iid=iid, values=fila)
+        previas = self._tree_rows.get(str(tree), {})
+        self._tree_rows[str(tree)] = {iid: (tuple(fila), ''), **previas}
+    
+    def _insertar_filas(self, tree, filas, iids=None, tags=None):
+        """Insert all rows into a treeview with a single Tcl call
+        
+        Rows are passed as a Tcl list value, so Tcl handles all quoting.
+        iids and tags, when given, are parallel to filas.
+        """
+        if not filas:
+            return
+        args = ['v', tuple(filas)]
+        script = f'{tree._w} insert {{}} end -values $v'
+        if iids is not None:
+            args += ['i', tuple(iids)]
+            script += ' -id $i'
+        if tags is not None:
+            args += ['t', tuple(tags)]
+            script += ' -tags $t'
+        tree.tk.call('foreach', *args, script)
+    
+    def _filas_ventas(self, ventas):
+        """Build (hora, monto, forma de pago, cliente, nota) rows for sales trees"""
+        fmt = self.format_currency
+        return [
+            (fecha_hora.partition(' ')[2] if fecha_hora else '', fmt(monto), forma_pago, cliente or '-', nota or '-')
+            for fecha_hora, monto, forma_pago, cliente, nota in map(_CAMPOS_VENTA, ventas)
+        ]
+    
+    def _poblar_tree_fiados(self, fiados, fmt):
+        """Sync tree_fiados with fiados, using the fiado id as item id"""
+        filas, iids, tags = [], [], []
+        for fiado in fiados:
+            fecha = fiado['fecha_creacion'].partition(' ')[0] if fiado['fecha_creacion'] else ''
+            
+            # Calculate color tag based on status
+            tag = ''
+            estado = fiado['estado']
+            if estado == _ESTADO_PAGADO:
+                tag = 'pagado'
+            elif estado == _ESTADO_PARCIAL:
+                tag = 'parcial'
+            
+            iid = str(fiado['id'])
+            filas.append((
+                fiado['id'],
+                fecha,
+                fiado['cliente_nombre'],
+                fmt(fiado['monto_total']),
+                _FMT_PCT(fiado['interes_porcentaje']),
+                fmt(fiado['monto_pagado']),
+                fmt(fiado['saldo_pendiente']),
+                fiado['estado'],
+                fiado['nota'] or '-'
+            ))
+            iids.append(iid)
+            tags.append(tag)
+            self._fiado_saldos[iid] = fiado['saldo_pendiente']
+            self._fiado_meta[iid] = (fiado['id'], fiado['cliente_id'], fiado['cliente_nombre'])
+        
+        self._sincronizar_tree(self.tree_fiados, filas, iids, tags)
+    
     def ver_historial_fiado(self):
         """Show payment history for selected fiado"""
         selection = self.tree_fiados.selection()
@@ -2126,12 +2331,9 @@ class KioscoApp:
         tree.heading('monto', text='Monto')
         tree.heading('nota', text='Nota')
         
-        for pago in historial:
-            tree.insert('', 'end', values=(
-                pago['fecha_pago'],
-                f"${pago['monto']:.2f}",
-                pago['nota'] or '-'
-            ))
+        filas = [(fecha, _FMT_MONEY(monto), nota or '-')
+                 for fecha, monto, nota in map(_CAMPOS_PAGO, historial)]
+        self._insertar_filas(tree, filas)
         
         tree.pack(fill='both', expand=True, padx=10, pady=10)
         
@@ -2142,21 +2344,31 @@ class KioscoApp:
             font=self.font_medium
         ).pack(pady=10)
     
+    def _nuevo_contenedor_resultados(self, parent):
+        """Replace the inner results frame of a search tab with an empty one"""
+        inner = getattr(parent, '_inner', None)
+        if inner is not None:
+            inner.destroy()
+        parent._inner = tk.Frame(parent, bg=Colors.BACKGROUND)
+        parent._inner.pack(fill='both', expand=True)
+        return parent._inner
+    
     def buscar_fecha(self):
         """Search sales by date"""
         try:
             fecha_str = self.var_buscar_fecha.get()
+            if not _DATE_RE.fullmatch(fecha_str):
+                raise ValueError("Formato de fecha inválido")
             datetime.strptime(fecha_str, '%Y-%m-%d')
             
             datos = self.db.obtener_resumen_diario(fecha_str)
             
-            # Clear previous results
-            for widget in self.search_result_frame.winfo_children():
-                widget.destroy()
+            # Swap in a fresh results container
+            result_frame = self._nuevo_contenedor_resultados(self.search_result_frame)
             
             # Show results
             tk.Label(
-                self.search_result_frame,
+                result_frame,
                 text=f"Resultados para: {fecha_str}",
                 font=self.font_header,
                 bg=Colors.BACKGROUND,
@@ -2164,7 +2376,7 @@ class KioscoApp:
             ).pack(anchor='w', pady=(0, 10))
             
             # Summary
-            summary = tk.Frame(self.search_result_frame, bg=Colors.CARD_BG, padx=20, pady=15)
+            summary = tk.Frame(result_frame, bg=Colors.CARD_BG, padx=20, pady=15)
             summary.pack(fill='x', pady=(0, 10))
             
             tk.Label(
@@ -2186,17 +2398,9 @@ class KioscoApp:
                 ).pack(anchor='w')
             
             # Sales list
-            self.create_report_treeview(self.search_result_frame, 'search')
-            
-            for venta in datos['ventas']:
-                hora = venta['fecha_hora'].split()[1] if venta['fecha_hora'] else ''
-                self.tree_search_report.insert('', 'end', values=(
-                    hora,
-                    self.format_currency(venta['monto']),
-                    venta['forma_pago'],
-                    venta['cliente'] or '-',
-                    venta['nota'] or '-'
-                ))
+            self.create_report_treeview(result_frame, 'search')
+            
+            self._insertar_filas(self.tree_search_report, self._filas_ventas(datos['ventas']))
             
         except ValueError:
             messagebox.showerror("❌ Error", "Formato de fecha inválido. Use: AAAA-MM-DD")
@@ -2212,18 +2416,17 @@ class KioscoApp:
             anio = self.var_buscar_mes_anio.get()
             
             # Validate year
-            if not anio.isdigit() or len(anio) != 4:
+            if not _YEAR_RE.fullmatch(anio):
                 raise ValueError("Año inválido")
             
             datos = self.db.obtener_resumen_mensual(int(anio), int(mes_num))
             
-            # Clear previous results
-            for widget in self.search_mes_result_frame.winfo_children():
-                widget.destroy()
+            # Swap in a fresh results container
+            result_frame = self._nuevo_contenedor_resultados(self.search_mes_result_frame)
             
             # Show results
             tk.Label(
-                self.search_mes_result_frame,
+                result_frame,
                 text=f"Resultados para: {mes_nombre} {anio}",
                 font=self.font_header,
                 bg=Colors.BACKGROUND,
@@ -2231,7 +2434,7 @@ class KioscoApp:
             ).pack(anchor='w', pady=(0, 10))
             
             # Summary
-            summary = tk.Frame(self.search_mes_result_frame, bg=Colors.CARD_BG, padx=20, pady=15)
+            summary = tk.Frame(result_frame, bg=Colors.CARD_BG, padx=20, pady=15)
             summary.pack(fill='x', pady=(0, 10))
             
             tk.Label(
@@ -2254,7 +2457,7 @@ class KioscoApp:
             
             # Daily breakdown treeview
             tk.Label(
-                self.search_mes_result_frame,
+                result_frame,
                 text="Detalle por Día:",
                 font=self.font_medium,
                 bg=Colors.BACKGROUND,
@@ -2262,7 +2465,7 @@ class KioscoApp:
             ).pack(anchor='w', pady=(10, 5))
             
             columns = ('fecha', 'total', 'efectivo', 'transferencia', 'debito', 'credito')
-            tree = ttk.Treeview(self.search_mes_result_frame, columns=columns, show='headings', height=12)
+            tree = ttk.Treeview(result_frame, columns=columns, show='headings', height=12)
             
             headers = {'fecha': 'Fecha', 'total': 'Total', 'efectivo': 'Efectivo', 
                       'transferencia': 'Transf.', 'debito': 'Débito', 'credito': 'Crédito'}
@@ -2273,21 +2476,23 @@ class KioscoApp:
             
             tree.column('fecha', width=120)
             
-            scrollbar = ttk.Scrollbar(self.search_mes_result_frame, orient='vertical', command=tree.yview)
+            scrollbar = ttk.Scrollbar(result_frame, orient='vertical', command=tree.yview)
             tree.configure(yscrollcommand=scrollbar.set)
             
             tree.pack(side='left', fill='both', expand=True)
             scrollbar.pack(side='right', fill='y')
             
-            for dia in datos['por_dia']:
-                tree.insert('', 'end', values=(
+            self._insertar_filas(tree, [
+                (
                     dia['dia'],
-                    f"${dia['total']:.2f}",
-                    f"${dia['efectivo']:.2f}",
-                    f"${dia['transferencia']:.2f}",
-                    f"${dia['debito']:.2f}",
-                    f"${dia['credito']:.2f}"
-                ))
+                    _FMT_MONEY(dia['total']),
+                    _FMT_MONEY(dia['efectivo']),
+                    _FMT_MONEY(dia['transferencia']),
+                    _FMT_MONEY(dia['debito']),
+                    _FMT_MONEY(dia['credito'])
+                )
+                for dia in datos['por_dia']
+            ])
             
         except Exception as e:
             messagebox.showerror("❌ Error", f"Error al buscar: {str(e)}")
@@ -2299,47 +2504,19 @@ class KioscoApp:
             anio = self.var_buscar_anio.get()
             
             # Validate year
-            if not anio.isdigit() or len(anio) != 4:
+            if not _YEAR_RE.fullmatch(anio):
                 raise ValueError("Año inválido. Use formato: AAAA")
             
-            anio_int = int(anio)
-            
             # Get data for all months
-            with self.db._get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT 
-                        strftime('%m', fecha_hora) as mes,
-                        COUNT(*) as cantidad,
-                        SUM(monto) as total,
-                        SUM(CASE WHEN forma_pago = 'Efectivo' THEN monto ELSE 0 END) as efectivo,
-                        SUM(CASE WHEN forma_pago = 'Transferencia' THEN monto ELSE 0 END) as transferencia,
-                        SUM(CASE WHEN forma_pago = 'Débito' THEN monto ELSE 0 END) as debito,
-                        SUM(CASE WHEN forma_pago = 'Crédito' THEN monto ELSE 0 END) as credito
-                    FROM ventas 
-                    WHERE strftime('%Y', fecha_hora) = ?
-                    GROUP BY mes
-                    ORDER BY mes
-                ''', (anio,))
-                
-                meses_data = cursor.fetchall()
-                
-                # Get total for year
-                cursor.execute('''
-                    SELECT COUNT(*), SUM(monto), AVG(monto)
-                    FROM ventas 
-                    WHERE strftime('%Y', fecha_hora) = ?
-                ''', (anio,))
-                
-                total_year = cursor.fetchone()
+            datos = self.db.obtener_resumen_anual(int(anio))
+            meses_data = datos['por_mes']
             
-            # Clear previous results
-            for widget in self.search_anio_result_frame.winfo_children():
-                widget.destroy()
+            # Swap in a fresh results container
+            result_frame = self._nuevo_contenedor_resultados(self.search_anio_result_frame)
             
             # Show results
             tk.Label(
-                self.search_anio_result_frame,
+                result_frame,
                 text=f"Resultados para el Año: {anio}",
                 font=self.font_header,
                 bg=Colors.BACKGROUND,
@@ -2347,12 +2524,12 @@ class KioscoApp:
             ).pack(anchor='w', pady=(0, 10))
             
             # Summary
-            summary = tk.Frame(self.search_anio_result_frame, bg=Colors.CARD_BG, padx=20, pady=15)
+            summary = tk.Frame(result_frame, bg=Colors.CARD_BG, padx=20, pady=15)
             summary.pack(fill='x', pady=(0, 10))
             
-            total_ventas = total_year['SUM(monto)'] or 0
-            cantidad_ventas = total_year['COUNT(*)'] or 0
-            promedio_ventas = total_year['AVG(monto)'] or 0
+            total_ventas = datos['total']
+            cantidad_ventas = datos['cantidad']
+            promedio_ventas = datos['promedio']
             
             tk.Label(
                 summary,
@@ -2364,47 +2541,39 @@ class KioscoApp:
             
             # Monthly breakdown treeview
             tk.Label(
-                self.search_anio_result_frame,
+                result_frame,
                 text="Resumen por Mes:",
                 font=self.font_medium,
                 bg=Colors.BACKGROUND,
                 fg=Colors.TEXT_PRIMARY
             ).pack(anchor='w', pady=(10, 5))
             
-            columns = ('mes', 'cantidad', 'total', 'efectivo', 'transferencia', 'debito', 'credito')
-            tree = ttk.Treeview(self.search_anio_result_frame, columns=columns, show='headings', height=12)
+            tree = ttk.Treeview(result_frame, columns=_COLUMNAS_ANIO, show='headings', height=12)
             
-            nombres_meses = {
-                '01': 'Enero', '02': 'Febrero', '03': 'Marzo', '04': 'Abril',
-                '05': 'Mayo', '06': 'Junio', '07': 'Julio', '08': 'Agosto',
-                '09': 'Septiembre', '10': 'Octubre', '11': 'Noviembre', '12': 'Diciembre'
-            }
-            
-            headers = {'mes': 'Mes', 'cantidad': 'Ventas', 'total': 'Total', 
-                      'efectivo': 'Efectivo', 'transferencia': 'Transf.', 'debito': 'Débito', 'credito': 'Crédito'}
-            
-            for col, header in headers.items():
+            for col, header in _HEADERS_ANIO.items():
                 tree.heading(col, text=header)
                 tree.column(col, width=100, anchor='center' if col != 'mes' else 'w')
             
             tree.column('mes', width=120)
             
-            scrollbar = ttk.Scrollbar(self.search_anio_result_frame, orient='vertical', command=tree.yview)
+            scrollbar = ttk.Scrollbar(result_frame, orient='vertical', command=tree.yview)
             tree.configure(yscrollcommand=scrollbar.set)
             
             tree.pack(side='left', fill='both', expand=True)
             scrollbar.pack(side='right', fill='y')
             
-            for mes_data in meses_data:
-                tree.insert('', 'end', values=(
-                    nombres_meses.get(mes_data['mes'], mes_data['mes']),
+            self._insertar_filas(tree, [
+                (
+                    _NOMBRES_MESES.get(mes_data['mes'], mes_data['mes']),
                     mes_data['cantidad'],
-                    f"${mes_data['total']:.2f}",
-                    f"${mes_data['efectivo']:.2f}",
-                    f"${mes_data['transferencia']:.2f}",
-                    f"${mes_data['debito']:.2f}",
-                    f"${mes_data['credito']:.2f}"
-                ))
+                    _FMT_MONEY(mes_data['total']),
+                    _FMT_MONEY(mes_data['efectivo']),
+                    _FMT_MONEY(mes_data['transferencia']),
+                    _FMT_MONEY(mes_data['debito']),
+                    _FMT_MONEY(mes_data['credito'])
+                )
+                for mes_data in meses_data
+            ])
             
         except Exception as e:
             messagebox.showerror("❌ Error", f"Error al buscar: {str(e)}")
@@ -2420,18 +2589,48 @@ class KioscoApp:
             )
             
             if archivo:
-                datos = self.db.exportar_a_json()
-                
-                with open(archivo, 'w', encoding='utf-8') as f:
-                    json.dump(datos, f, indent=2, ensure_ascii=False)
-                
-                messagebox.showinfo("✅ Éxito", f"Datos exportados a:\n{archivo}")
-                logger.info(f"Datos exportados: {archivo}")
+                # Write off the UI thread; the main loop polls for completion
+                resultado = {}
+                hilo = threading.Thread(target=self._write_export, args=(archivo, resultado), daemon=True)
+                hilo.start()
+                self.lbl_status.config(text="Exportando datos...")
+                self.root.after(100, self._check_export, hilo, archivo, resultado)
         
         except Exception as e:
             messagebox.showerror("❌ Error", f"Error al exportar: {str(e)}")
             logger.error(f"Error al exportar: {e}")
     
+    def _write_export(self, archivo, resultado):
+        """Write the export file - runs on a worker thread and never touches Tk"""
+        # Write next to the target and swap it in, so a failed export never leaves a half-written file
+        tmp_path = archivo + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                self.db.exportar_a_json_stream(f)
+            os.replace(tmp_path, archivo)
+        except Exception as e:
+            resultado['error'] = e
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    
+    def _check_export(self, hilo, archivo, resultado):
+        """Report the export result once the worker thread has finished"""
+        if hilo.is_alive():
+            self.root.after(100, self._check_export, hilo, archivo, resultado)
+            return
+        
+        if 'error' in resultado:
+            e = resultado['error']
+            self.lbl_status.config(text="Error al exportar")
+            messagebox.showerror("❌ Error", f"Error al exportar: {str(e)}")
+            logger.error(f"Error al exportar: {e}")
+        else:
+            self.lbl_status.config(text="Datos exportados")
+            messagebox.showinfo("✅ Éxito", f"Datos exportados a:\n{archivo}")
+            logger.info(f"Datos exportados: {archivo}")
+    
     def load_initial_data(self):
         """Load initial data when app starts"""
         self.refresh_all()
@@ -2441,48 +2640,116 @@ class KioscoApp:
     
     def on_tab_changed(self, event):
         """Handle tab change - focus on monto field when Ventas tab is selected"""
+        self._maybe_build_tab()
         if hasattr(self, 'entry_monto'):
             self.entry_monto.focus_set()
     
+    def _maybe_build_tab(self):
+        """Build the selected main tab if this is its first activation"""
+        if str(self.notebook.select()) == str(self.tab_reportes):
+            self._build_reports_tab()
+    
+    def _build_reports_tab(self):
+        """Build the reports tab and load its data, once"""
+        if 'reportes' in self._tabs_built:
+            return
+        self._tabs_built.add('reportes')
+        self.create_tab_reportes()
+        self.update_daily_report()
+        self.update_monthly_report()
+    
+    def _build_history_tab(self):
+        """Build the payment history sub-tab, once"""
+        if 'historial' in self._tabs_built:
+            return
+        self._tabs_built.add('historial')
+        self.create_tab_historial_pagos(self.tab_historial_pagos)
+    
     def refresh_all(self):
         """Refresh all data displays"""
         try:
-            self.cargar_ventas_hoy()
-            self.update_daily_report()
+            # Fetch shared summaries once for all views
+            resumen_diario = self.db.obtener_resumen_diario()
+            stats_fiados = self.db.obtener_estadisticas_fiados()
+            
+            self.cargar_ventas_hoy(resumen=resumen_diario)
+            self.update_daily_report(resumen=resumen_diario)
             self.update_monthly_report()
-            self.cargar_fiados()
+            self.cargar_fiados(stats=stats_fiados)
             self.cargar_clientes_en_combo_fiados()  # Refresh client filter
-            self.update_status_bar()
+            self.update_status_bar(resumen=resumen_diario, stats=stats_fiados)
             self.lbl_status.config(text="Datos actualizados")
             logger.info("Datos refrescados")
         except Exception as e:
             logger.error(f"Error al refrescar datos: {e}")
     
-    def cargar_ventas_hoy(self):
-        """Load today's sales"""
-        # Clear treeview
-        for item in self.tree_ventas.get_children():
-            self.tree_ventas.delete(item)
-        
+    def cargar_ventas_hoy(self, resumen=None):
+        """Load today's sales, optionally from an already fetched daily summary"""
         # Get data
-        datos = self.db.obtener_resumen_diario()
+        datos = resumen if resumen is not None else self.db.obtener_resumen_diario()
+        self._resumen_hoy = datos
+        self._fecha_resumen_hoy = datetime.now().date()
         
         # Populate treeview
-        for venta in datos['ventas']:
-            hora = venta['fecha_hora'].split()[1] if venta['fecha_hora'] else ''
-            self.tree_ventas.insert('', 'end', values=(
-                hora,
-                self.format_currency(venta['monto']),
-                venta['forma_pago'],
-                venta['cliente'] or '-',
-                venta['nota'] or '-',
-                venta['id']
-            ))
-    
-    def update_daily_report(self):
-        """Update daily report view"""
-        datos = self.db.obtener_resumen_diario()
+        filas = self._filas_ventas(datos['ventas'])
+        iids = [str(venta['id']) for venta in datos['ventas']]
+        self._sincronizar_tree(self.tree_ventas, [
+            fila + (venta['id'],) for fila, venta in zip(filas, datos['ventas'])
+        ], iids)
+    
+    def _append_venta_row(self, venta_id, monto, forma_pago, cliente, nota):
+        """Show a just-saved sale by updating today's views in place"""
+        ahora = datetime.now()
+        datos = self._resumen_hoy
+        
+        if datos is None or self._fecha_resumen_hoy != ahora.date():
+            # Nothing loaded yet or the day rolled over - reload everything
+            self.refresh_all()
+            return
         
+        # Newest first, same order as obtener_ventas_por_fecha
+        hora = ahora.strftime('%H:%M:%S')
+        valores = (hora, self.format_currency(monto), forma_pago, cliente or '-', nota or '-')
+        self._anteponer_fila(self.tree_ventas, str(venta_id), valores + (venta_id,))
+        if hasattr(self, 'tree_daily_report'):
+            self._anteponer_fila(self.tree_daily_report, str(venta_id), valores)
+        
+        # Update in-memory totals
+        datos['total'] += monto
+        datos['cantidad'] += 1
+        pago = datos['por_forma_pago'].setdefault(forma_pago, {'cantidad': 0, 'total': 0})
+        pago['cantidad'] += 1
+        pago['total'] += monto
+        turno = datos['turno_mañana'] if 6 <= ahora.hour < 18 else datos['turno_tarde']
+        turno['cantidad'] += 1
+        turno['total'] += monto
+        
+        self._render_daily_summary(datos)
+        self._render_status_totals(datos['total'], self._saldo_fiados_pendiente)
+        
+        # The monthly view is a single aggregate query
+        self.update_monthly_report()
+    
+    def update_daily_report(self, resumen=None):
+        """Update daily report view, optionally from an already fetched daily summary"""
+        if 'reportes' not in self._tabs_built:
+            return
+        datos = resumen if resumen is not None else self.db.obtener_resumen_diario()
+        self._resumen_hoy = datos
+        self._fecha_resumen_hoy = datetime.now().date()
+        
+        self._render_daily_summary(datos)
+        
+        # Update treeview
+        if hasattr(self, 'tree_daily_report'):
+            self._sincronizar_tree(
+                self.tree_daily_report,
+                self._filas_ventas(datos['ventas']),
+                [str(venta['id']) for venta in datos['ventas']]
+            )
+    
+    def _render_daily_summary(self, datos):
+        """Update daily summary cards and payment breakdown from a daily summary"""
         # Update cards
         if hasattr(self, 'daily_total_label'):
             self.daily_total_label.config(text=self.format_currency(datos['total']))
@@ -2498,9 +2765,6 @@ class KioscoApp:
         
         # Update payment breakdown - horizontal layout with colors
         if hasattr(self, 'daily_pagos_frame'):
-            for widget in self.daily_pagos_frame.winfo_children()[1:]:  # Keep title
-                widget.destroy()
-            
             # Colors for each payment method
             payment_colors = {
                 'Efectivo': '#10B981',      # Verde
@@ -2510,38 +2774,33 @@ class KioscoApp:
                 'QR': '#EC4899'             # Rosa
             }
             
-            labels_frame = tk.Frame(self.daily_pagos_frame, bg=Colors.CARD_BG)
-            labels_frame.pack(anchor='w')
+            card_bg = Colors.CARD_BG
+            default_fg = Colors.TEXT_PRIMARY
             
-            for forma_pago, info in datos['por_forma_pago'].items():
+            # Reuse labels; grid column keeps them in data order
+            for col, (forma_pago, info) in enumerate(datos['por_forma_pago'].items()):
                 total_str = self.format_currency(info['total'])
-                color = payment_colors.get(forma_pago, Colors.TEXT_PRIMARY)
-                
-                tk.Label(
-                    labels_frame,
-                    text=f"{forma_pago}: {total_str} ({info['cantidad']})",
-                    font=self.font_normal,
-                    bg=Colors.CARD_BG,
-                    fg=color
-                ).pack(side='left', padx=(0, 15))
-        
-        # Update treeview
-        if hasattr(self, 'tree_daily_report'):
-            for item in self.tree_daily_report.get_children():
-                self.tree_daily_report.delete(item)
-            
-            for venta in datos['ventas']:
-                hora = venta['fecha_hora'].split()[1] if venta['fecha_hora'] else ''
-                self.tree_daily_report.insert('', 'end', values=(
-                    hora,
-                    self.format_currency(venta['monto']),
-                    venta['forma_pago'],
-                    venta['cliente'] or '-',
-                    venta['nota'] or '-'
-                ))
+                label = self._pago_labels.get(forma_pago)
+                if label is None:
+                    label = tk.Label(
+                        self._pagos_labels_frame,
+                        font=self.font_normal,
+                        bg=card_bg,
+                        fg=payment_colors.get(forma_pago, default_fg)
+                    )
+                    self._pago_labels[forma_pago] = label
+                label.config(text=f"{forma_pago}: {total_str} ({info['cantidad']})")
+                label.grid(row=0, column=col, padx=(0, 15))
+            
+            # Hide methods with no sales in this summary
+            for forma_pago, label in self._pago_labels.items():
+                if forma_pago not in datos['por_forma_pago']:
+                    label.grid_remove()
     
     def update_monthly_report(self):
         """Update monthly report view"""
+        if 'reportes' not in self._tabs_built:
+            return
         datos = self.db.obtener_resumen_mensual()
         
         # Update total card
@@ -2552,28 +2811,28 @@ class KioscoApp:
         
         # Update treeview
         if hasattr(self, 'tree_mensual'):
-            for item in self.tree_mensual.get_children():
-                self.tree_mensual.delete(item)
-            
-            for dia in datos['por_dia']:
-                self.tree_mensual.insert('', 'end', values=(
+            fmt = self.format_currency
+            self._sincronizar_tree(self.tree_mensual, [
+                (
                     dia['dia'],
-                    self.format_currency(dia['total']),
-                    self.format_currency(dia['efectivo']),
-                    self.format_currency(dia['transferencia']),
-                    self.format_currency(dia['debito']),
-                    self.format_currency(dia['credito'])
-                ))
-    
-    def cargar_fiados(self, estado=None):
+                    fmt(dia['total']),
+                    fmt(dia['efectivo']),
+                    fmt(dia['transferencia']),
+                    fmt(dia['debito']),
+                    fmt(dia['credito'])
+                )
+                for dia in datos['por_dia']
+            ], [dia['dia'] for dia in datos['por_dia']])
+    
+    def cargar_fiados(self, estado=None, stats=None):
         """Load fiados list with saldo pendiente"""
-        # Clear treeview
-        for item in self.tree_fiados.get_children():
-            self.tree_fiados.delete(item)
+        self._fiado_saldos.clear()
+        self._fiado_meta.clear()
         
         # Get data
         fiados = self.db.obtener_fiados(estado)
-        stats = self.db.obtener_estadisticas_fiados()
+        if stats is None:
+            stats = self.db.obtener_estadisticas_fiados()
         
         # Update total label
         if hasattr(self, 'lbl_total_fiados'):
@@ -2582,31 +2841,7 @@ class KioscoApp:
             )
         
         # Populate treeview with saldo
-        for fiado in fiados:
-            fecha = fiado['fecha_creacion'].split()[0] if fiado['fecha_creacion'] else ''
-            
-            # Calculate color tag based on status
-            tag = ''
-            if fiado['estado'] == EstadoFiado.PAGADO.value:
-                tag = 'pagado'
-            elif fiado['estado'] == EstadoFiado.PARCIAL.value:
-                tag = 'parcial'
-            
-            item = self.tree_fiados.insert('', 'end', values=(
-                fiado['id'],
-                fecha,
-                fiado['cliente_nombre'],
-                self.format_currency(fiado['monto_total']),
-                f"{fiado['interes_porcentaje']}%",
-                self.format_currency(fiado['monto_pagado']),
-                self.format_currency(fiado['saldo_pendiente']),
-                fiado['estado'],
-                fiado['nota'] or '-'
-            ), tags=(tag,))
-        
-        # Configure tags
-        self.tree_fiados.tag_configure('pagado', foreground=Colors.SUCCESS)
-        self.tree_fiados.tag_configure('parcial', foreground=Colors.WARNING)
+        self._poblar_tree_fiados(fiados, self.format_currency)
     
     def cargar_fiados_filtrados(self, estado=None):
         """Load fiados with client filter applied"""
@@ -2640,15 +2875,14 @@ class KioscoApp:
     
     def cargar_fiados_por_cliente(self, cliente_id, estado=None):
         """Load fiados for specific client"""
-        # Clear treeview
-        for item in self.tree_fiados.get_children():
-            self.tree_fiados.delete(item)
+        self._fiado_saldos.clear()
+        self._fiado_meta.clear()
         
         # Get data
         fiados = self.db.obtener_fiados(estado, cliente_id)
         
-        # Calculate total for this client
-        total_pendiente = sum(f['saldo_pendiente'] for f in fiados if f['estado'] in ['Pendiente', 'Parcial'])
+        # Client total from SQL, independent of the estado filter on the list
+        total_pendiente = self.db.obtener_saldo_pendiente_cliente(cliente_id)
         
         # Update total label
         if hasattr(self, 'lbl_total_fiados'):
@@ -2657,36 +2891,12 @@ class KioscoApp:
             )
         
         # Populate treeview
-        for fiado in fiados:
-            fecha = fiado['fecha_creacion'].split()[0] if fiado['fecha_creacion'] else ''
-            
-            tag = ''
-            if fiado['estado'] == EstadoFiado.PAGADO.value:
-                tag = 'pagado'
-            elif fiado['estado'] == EstadoFiado.PARCIAL.value:
-                tag = 'parcial'
-            
-            item = self.tree_fiados.insert('', 'end', values=(
-                fiado['id'],
-                fecha,
-                fiado['cliente_nombre'],
-                f"${fiado['monto_total']:.2f}",
-                f"{fiado['interes_porcentaje']}%",
-                f"${fiado['monto_pagado']:.2f}",
-                f"${fiado['saldo_pendiente']:.2f}",
-                fiado['estado'],
-                fiado['nota'] or '-'
-            ), tags=(tag,))
-        
-        # Configure tags
-        self.tree_fiados.tag_configure('pagado', foreground=Colors.SUCCESS)
-        self.tree_fiados.tag_configure('parcial', foreground=Colors.WARNING)
+        self._poblar_tree_fiados(fiados, _FMT_MONEY)
     
     def cargar_fiados_pendientes_y_parciales(self):
         """Load fiados with 'Pendiente' or 'Parcial' status"""
-        # Clear treeview
-        for item in self.tree_fiados.get_children():
-            self.tree_fiados.delete(item)
+        self._fiado_saldos.clear()
+        self._fiado_meta.clear()
         
         # Get client filter if applied
         cliente_id = None
@@ -2694,45 +2904,15 @@ class KioscoApp:
             cliente_id = self.filtro_cliente_id_actual
         
         # Get data - both Pendiente and Parcial
-        with self.db._get_connection() as conn:
-            cursor = conn.cursor()
-            
-            query = '''
-                SELECT 
-                    f.*,
-                    CASE 
-                        WHEN f.monto_pagado > 0 THEN ROUND((f.monto_pagado / f.monto_total) * 100, 1)
-                        ELSE 0 
-                    END as porcentaje_pagado
-                FROM fiados f
-                WHERE f.estado IN ('Pendiente', 'Parcial')
-            '''
-            params = []
-            
-            if cliente_id:
-                query += " AND f.cliente_id = ?"
-                params.append(cliente_id)
-            
-            query += " ORDER BY f.fecha_creacion DESC"
-            
-            cursor.execute(query, params)
-            fiados = cursor.fetchall()
-            
-            # Calculate total
-            if cliente_id:
-                cursor.execute('''
-                    SELECT SUM(saldo_pendiente) 
-                    FROM fiados 
-                    WHERE cliente_id = ? AND estado IN ('Pendiente', 'Parcial')
-                ''', (cliente_id,))
-            else:
-                cursor.execute('''
-                    SELECT SUM(saldo_pendiente) 
-                    FROM fiados 
-                    WHERE estado IN ('Pendiente', 'Parcial')
-                ''')
-            
-            total_pendiente = cursor.fetchone()[0] or 0
+        cursor = self.db.read_conn.cursor()
+        if cliente_id:
+            cursor.execute(_SQL_FIADOS_ABIERTOS_CLIENTE, (cliente_id,))
+        else:
+            cursor.execute(_SQL_FIADOS_ABIERTOS_TODOS)
+        fiados = cursor.fetchall()
+        
+        # Calculate total from the rows already fetched (same filter)
+        total_pendiente = sum(f['saldo_pendiente'] for f in fiados) or 0
         
         # Update label
         if hasattr(self, 'lbl_total_fiados'):
@@ -2748,30 +2928,7 @@ class KioscoApp:
                 )
         
         # Populate treeview
-        for fiado in fiados:
-            fecha = fiado['fecha_creacion'].split()[0] if fiado['fecha_creacion'] else ''
-            
-            tag = ''
-            if fiado['estado'] == EstadoFiado.PAGADO.value:
-                tag = 'pagado'
-            elif fiado['estado'] == EstadoFiado.PARCIAL.value:
-                tag = 'parcial'
-            
-            item = self.tree_fiados.insert('', 'end', values=(
-                fiado['id'],
-                fecha,
-                fiado['cliente_nombre'],
-                f"${fiado['monto_total']:.2f}",
-                f"{fiado['interes_porcentaje']}%",
-                f"${fiado['monto_pagado']:.2f}",
-                f"${fiado['saldo_pendiente']:.2f}",
-                fiado['estado'],
-                fiado['nota'] or '-'
-            ), tags=(tag,))
-        
-        # Configure tags
-        self.tree_fiados.tag_configure('pagado', foreground=Colors.SUCCESS)
-        self.tree_fiados.tag_configure('parcial', foreground=Colors.WARNING)
+        self._poblar_tree_fiados(fiados, _FMT_MONEY)
     
     def on_filtro_cliente_fiados_changed(self, event=None):
         """Handle client filter selection change"""
@@ -2823,6 +2980,7 @@ class KioscoApp:
                     self.filtro_cliente_id_actual, 
                     porcentaje
                 )
+                self.invalidar_saldos_clientes()
                 
                 msg = f"✅ Interés aplicado exitosamente!\n\n"
                 msg += f"Porcentaje aplicado: {porcentaje}%\n"
@@ -2832,11 +2990,7 @@ class KioscoApp:
                 messagebox.showinfo("✅ Éxito", msg)
                 
                 # Refresh views
-                self.cargar_fiados_filtrados(None)
-                
-                # Refresh client balance in "Nuevo Fiado" tab if same client is selected
-                if self.var_fiado_cliente_id.get() == self.filtro_cliente_id_actual:
-                    self.actualizar_saldo_cliente(self.filtro_cliente_id_actual)
+                self._schedule_refresh()
                 
                 logger.info(f"Interés aplicado: Cliente={self.filtro_cliente_id_actual}, {resultado['fiados_actualizados']} fiados")
                 
@@ -2844,6 +2998,37 @@ class KioscoApp:
                 messagebox.showerror("❌ Error", str(e))
                 logger.error(f"Error al aplicar interés: {e}")
     
+    def _schedule_refresh(self, mensaje_total=None):
+        """Coalesce the fiado views update after a bulk operation into one idle pass"""
+        if mensaje_total is not None:
+            self._refresh_total_msg = mensaje_total
+        if not self._pending_refresh:
+            self._pending_refresh = True
+            self.root.after_idle(self._do_refresh)
+    
+    def _do_refresh(self):
+        """Run the update queued by _schedule_refresh"""
+        self._pending_refresh = False
+        try:
+            self.cargar_fiados_filtrados(None)
+            self.update_status_bar()
+            
+            # Refresh client balance only if "Nuevo Fiado" is showing that client;
+            # otherwise on_fiados_tab_changed refreshes it when the tab is opened
+            cliente_id = self.filtro_cliente_id_actual
+            if (cliente_id
+                    and self.fiados_notebook.index('current') == self._nuevo_fiado_tab_idx
+                    and self.var_fiado_cliente_id.get() == cliente_id):
+                self.actualizar_saldo_cliente(cliente_id)
+            
+            if self._refresh_total_msg is not None:
+                texto, color = self._refresh_total_msg
+                self.lbl_total_fiados.config(text=texto, fg=color)
+        except Exception as e:
+            logger.error(f"Error al refrescar fiados: {e}")
+        finally:
+            self._refresh_total_msg = None
+    
     def pagar_todos_fiados_cliente(self):
         """Pay all pending/partial fiados of selected client"""
         if not hasattr(self, 'filtro_cliente_id_actual') or not self.filtro_cliente_id_actual:
@@ -2875,6 +3060,7 @@ class KioscoApp:
                     monto,
                     "Pago total de todos los fiados"
                 )
+                self.invalidar_saldos_clientes()
                 
                 msg = f"✅ Pagos registrados exitosamente!\n\n"
                 msg += f"Cliente: {resultado['cliente_nombre']}\n"
@@ -2884,19 +3070,9 @@ class KioscoApp:
                 messagebox.showinfo("✅ Éxito", msg)
                 
                 # Refresh views - mantener filtro del cliente
-                self.cargar_fiados_filtrados(None)
-                self.update_status_bar()
-                
-                # Refresh client balance in "Nuevo Fiado" tab
-                if self.var_fiado_cliente_id.get() == self.filtro_cliente_id_actual:
-                    self.actualizar_saldo_cliente(self.filtro_cliente_id_actual)
-                
                 # Mostrar mensaje si el cliente ya no tiene fiados pendientes
                 # pero mantener el filtro activo para que vea el historial
-                self.lbl_total_fiados.config(
-                    text=f"✅ Cliente al día - Sin fiados pendientes",
-                    fg=Colors.SUCCESS
-                )
+                self._schedule_refresh(("✅ Cliente al día - Sin fiados pendientes", Colors.SUCCESS))
                 
                 logger.info(f"Pago masivo: Cliente={resultado['cliente_nombre']}, ${resultado['total_pagado']}, {resultado['cantidad_fiados']} fiados")
                 
@@ -2961,14 +3137,10 @@ class KioscoApp:
         tree.column('monto', width=100)
         tree.column('nota', width=300)
         
-        total_pagos = 0
-        for pago in historial:
-            tree.insert('', 'end', values=(
-                pago['fecha_pago'],
-                f"${pago['monto']:.2f}",
-                pago['nota'] or '-'
-            ))
-            total_pagos += pago['monto']
+        filas = [(fecha, _FMT_MONEY(monto), nota or '-')
+                 for fecha, monto, nota in map(_CAMPOS_PAGO, historial)]
+        self._insertar_filas(tree, filas)
+        total_pagos = sum(pago['monto'] for pago in historial)
         
         tree.pack(fill='both', expand=True, padx=20, pady=10)
         
@@ -2997,8 +3169,7 @@ class KioscoApp:
         
         try:
             # Clear treeview
-            for item in self.tree_historial.get_children():
-                self.tree_historial.delete(item)
+            self._vaciar_tree(self.tree_historial)
             
             # Get data
             historial = self.db.obtener_historial_pagos_cliente(cliente_id)
@@ -3016,14 +3187,11 @@ class KioscoApp:
             self.lbl_historial_totales.config(text=resumen_text)
             
             # Populate treeview
-            for fiado in historial['fiados']:
-                for pago in fiado['pagos']:
-                    self.tree_historial.insert('', 'end', values=(
-                        pago['fecha_pago'],
-                        f"#{fiado['fiado_id']}",
-                        f"${pago['monto']:.2f}",
-                        pago['nota'] or '-'
-                    ))
+            self._insertar_filas(self.tree_historial, [
+                (pago['fecha_pago'], f"#{fiado['fiado_id']}", _FMT_MONEY(pago['monto']), pago['nota'] or '-')
+                for fiado in historial['fiados']
+                for pago in fiado['pagos']
+            ])
             
             logger.info(f"Historial cargado: Cliente={nombre}, Pagos={cantidad_pagos}")
             
@@ -3031,18 +3199,23 @@ class KioscoApp:
             logger.error(f"Error al cargar historial: {e}")
             messagebox.showerror("❌ Error", f"No se pudo cargar el historial: {e}")
     
-    def update_status_bar(self):
-        """Update status bar with totals"""
+    def update_status_bar(self, resumen=None, stats=None):
+        """Update status bar with totals, reusing summaries passed by the caller"""
         try:
-            ventas_hoy = self.db.obtener_resumen_diario()
-            stats_fiados = self.db.obtener_estadisticas_fiados()
+            ventas_hoy = resumen if resumen is not None else self.db.obtener_resumen_diario()
+            stats_fiados = stats if stats is not None else self.db.obtener_estadisticas_fiados()
             
-            self.lbl_totals.config(
-                text=f"💰 Hoy: {self.format_currency(ventas_hoy['total'])}  |  "
-                     f"📒 Fiados pendientes: {self.format_currency(stats_fiados['saldo_pendiente'])}"
-            )
+            self._saldo_fiados_pendiente = stats_fiados['saldo_pendiente']
+            self._render_status_totals(ventas_hoy['total'], stats_fiados['saldo_pendiente'])
         except Exception as e:
             logger.error(f"Error al actualizar barra de estado: {e}")
+    
+    def _render_status_totals(self, total_hoy, saldo_fiados):
+        """Show today's total and pending fiados in the status bar"""
+        self.lbl_totals.config(
+            text=f"💰 Hoy: {self.format_currency(total_hoy)}  |  "
+                 f"📒 Fiados pendientes: {self.format_currency(saldo_fiados)}"
+        )
 
 
 def main():
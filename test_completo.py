@@ -1,316 +1,335 @@
 """
 Test Suite Completo - Kiosco Manager
 Prueba TODAS las funcionalidades del sistema
+
+Ejecutar con: pytest -n auto --dist=loadgroup
 """
 
 import sys
 import os
-from datetime import datetime, timedelta
-import random
+import io
+import json
+
+import pytest
 
 # Asegurar que podemos importar los módulos
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from database import Database, DatabaseError, FormaPago, EstadoFiado
-
-class TestColors:
-    OK = '[OK]'
-    FAIL = '[FAIL]'
-    WARNING = '[WARN]'
-    INFO = '[INFO]'
-    END = ''
-
-class KioscoTester:
-    def __init__(self):
-        self.db = None
-        self.tests_passed = 0
-        self.tests_failed = 0
-        self.test_results = []
-        # Generar nombres únicos para cada ejecución
-        self.test_suffix = str(random.randint(1000, 9999))
-        
-    def setup(self):
-        """Inicializar base de datos de prueba"""
-        print(f"{TestColors.INFO} Inicializando base de datos...")
-        try:
-            self.db = Database()
-            print(f"{TestColors.OK} Base de datos inicializada (suffix: {self.test_suffix})")
-            return True
-        except Exception as e:
-            print(f"{TestColors.FAIL} Error al inicializar BD: {e}")
-            return False
-    
-    def run_test(self, test_name, test_func):
-        """Ejecutar un test individual"""
-        try:
-            print(f"{TestColors.INFO} Test: {test_name}")
-            test_func()
-            self.tests_passed += 1
-            self.test_results.append((test_name, True, None))
-            print(f"{TestColors.OK}  PASSED")
-            return True
-        except Exception as e:
-            self.tests_failed += 1
-            self.test_results.append((test_name, False, str(e)))
-            print(f"{TestColors.FAIL}  FAILED: {e}")
-            return False
-    
-    # ==========================================
-    # TESTS DE VENTAS
-    # ==========================================
-    def test_crear_venta(self):
-        """Test: Crear una venta básica"""
-        venta_id = self.db.agregar_venta(
-            monto=1500.50,
-            forma_pago="Efectivo",
-            cliente="Test Cliente",
-            nota="Venta de prueba"
-        )
-        assert venta_id is not None, "No se retornó ID de venta"
-        assert venta_id > 0, f"ID de venta inválido: {venta_id}"
-        self.test_venta_id = venta_id
-        
-    def test_crear_venta_sin_cliente(self):
-        """Test: Crear venta sin cliente (opcional)"""
-        venta_id = self.db.agregar_venta(
-            monto=500,
-            forma_pago="Transferencia",
-            cliente="",
-            nota=""
-        )
-        assert venta_id is not None, "No se retornó ID de venta"
-        
-    def test_crear_venta_monto_invalido(self):
-        """Test: Intentar crear venta con monto inválido"""
-        try:
-            self.db.agregar_venta(monto=-100, forma_pago="Efectivo")
-            assert False, "Debería haber fallado con monto negativo"
-        except (ValueError, DatabaseError):
-            pass  # Expected
-            
-    def test_obtener_ventas_hoy(self):
-        """Test: Obtener ventas del día"""
-        datos = self.db.obtener_resumen_diario()
-        assert 'ventas' in datos, "No se encontró key 'ventas'"
-        assert 'total' in datos, "No se encontró key 'total'"
-        assert 'cantidad' in datos, "No se encontró key 'cantidad'"
-        assert 'por_forma_pago' in datos, "No se encontró key 'por_forma_pago'"
-        assert datos['cantidad'] >= 2, f"Se esperaban al menos 2 ventas, hay {datos['cantidad']}"
-        
-    def test_obtener_ventas_por_fecha(self):
-        """Test: Obtener ventas de fecha específica"""
-        hoy = datetime.now().strftime('%Y-%m-%d')
-        datos = self.db.obtener_ventas_por_fecha(hoy)
-        assert 'ventas' in datos
-        assert len(datos['ventas']) >= 2
-        
-    def test_resumen_mensual(self):
-        """Test: Obtener resumen mensual"""
-        hoy = datetime.now()
-        datos = self.db.obtener_resumen_mensual(hoy.year, hoy.month)
-        assert 'total' in datos
-        assert 'cantidad' in datos
-        assert 'por_forma_pago' in datos
-        assert 'por_dia' in datos
-        
-    # ==========================================
-    # TESTS DE CLIENTES
-    # ==========================================
-    def test_crear_cliente(self):
-        """Test: Crear un cliente nuevo"""
-        cliente_id = self.db.agregar_cliente(
-            nombre=f"Juan Pérez {self.test_suffix}",
-            telefono="1234567890",
-            email="juan@test.com",
-            direccion="Calle Test 123",
-            notas="Cliente de prueba"
-        )
-        assert cliente_id is not None, "No se retornó ID de cliente"
-        assert cliente_id > 0, f"ID de cliente inválido: {cliente_id}"
-        self.test_cliente_id = cliente_id
-        
-    def test_crear_cliente_duplicado(self):
-        """Test: Intentar crear cliente duplicado"""
-        try:
-            self.db.agregar_cliente(nombre=f"Juan Pérez {self.test_suffix}")
-            assert False, "Debería fallar con cliente duplicado"
-        except (ValueError, DatabaseError):
-            pass  # Expected
-            
-    def test_obtener_clientes(self):
-        """Test: Obtener lista de clientes"""
-        clientes = self.db.obtener_clientes()
-        assert len(clientes) > 0, "No se encontraron clientes"
-        assert any(c['nombre'] == f"Juan Pérez {self.test_suffix}" for c in clientes), "No se encontró cliente de prueba"
-        
-    def test_buscar_cliente_por_nombre(self):
-        """Test: Buscar cliente por nombre"""
-        cliente = self.db.buscar_cliente_por_nombre(f"Juan Pérez {self.test_suffix}")
-        assert cliente is not None, "No se encontró cliente"
-        assert cliente['nombre'] == f"Juan Pérez {self.test_suffix}"
-        
-    # ==========================================
-    # TESTS DE FIADOS
-    # ==========================================
-    def test_crear_fiado(self):
+from database import Database, DatabaseError, MEMORY_PATH
+
+# Cada test arranca con la base vacía, así que los nombres pueden ser fijos
+NOMBRE_JUAN = "Juan Pérez"
+NOMBRE_MARIA = "María García"
+
+
+# ==========================================
+# TESTS DE VENTAS
+# ==========================================
+def test_crear_venta(db):
+    """Test: Crear una venta básica"""
+    venta_id = db.agregar_venta(
+        monto=1500.50,
+        forma_pago="Efectivo",
+        cliente="Test Cliente",
+        nota="Venta de prueba"
+    )
+    assert venta_id is not None, "No se retornó ID de venta"
+    assert venta_id > 0, f"ID de venta inválido: {venta_id}"
+
+
+def test_crear_venta_sin_cliente(db):
+    """Test: Crear venta sin cliente (opcional)"""
+    venta_id = db.agregar_venta(
+        monto=500,
+        forma_pago="Transferencia",
+        cliente="",
+        nota=""
+    )
+    assert venta_id is not None, "No se retornó ID de venta"
+
+
+@pytest.mark.parametrize("monto", [-100, -0.01, 0, None, "abc", float("nan")])
+def test_crear_venta_monto_invalido(db, monto):
+    """Test: Intentar crear venta con monto inválido"""
+    with pytest.raises((ValueError, DatabaseError)):
+        db.agregar_venta(monto=monto, forma_pago="Efectivo")
+
+
+def test_obtener_ventas_hoy(db, ahora):
+    """Test: Obtener ventas del día"""
+    db.agregar_venta(monto=1200, forma_pago="Efectivo", fecha_hora=ahora)
+    datos = db.obtener_resumen_diario(ahora.strftime('%Y-%m-%d'))
+    faltantes = {'ventas', 'total', 'cantidad', 'por_forma_pago'} - datos.keys()
+    assert not faltantes, f"Faltan keys: {faltantes}"
+    assert datos['cantidad'] == 1, f"Se esperaba 1 venta, hay {datos['cantidad']}"
+    assert abs(datos['total'] - 1200) < 0.01
+
+
+def test_obtener_ventas_por_fecha(db_con_ventas, ahora):
+    """Test: Obtener ventas de fecha específica"""
+    datos = db_con_ventas.obtener_ventas_por_fecha(ahora.strftime('%Y-%m-%d'))
+    assert 'ventas' in datos
+    assert len(datos['ventas']) == 2
+
+
+def test_resumen_mensual(db_con_mes, ahora):
+    """Test: Obtener resumen mensual"""
+    datos = db_con_mes.obtener_resumen_mensual(ahora.year, ahora.month)
+    faltantes = {'total', 'cantidad', 'por_forma_pago', 'por_dia'} - datos.keys()
+    assert not faltantes, f"Faltan keys: {faltantes}"
+    assert datos['cantidad'] == 280, f"Se esperaban 280 ventas, hay {datos['cantidad']}"
+    assert len(datos['por_dia']) == 28
+    assert datos['cantidad'] == sum(d['cantidad'] for d in datos['por_dia'])
+    # Cada día: montos 100..109
+    assert all(d['cantidad'] == 10 and abs(d['total'] - 1045) < 0.01 for d in datos['por_dia'])
+    assert datos['por_dia'][0]['dia'] == ahora.replace(day=28).strftime('%Y-%m-%d')
+
+
+def test_bulk_agregar_ventas(db, ahora):
+    """Test: Carga de ventas en lote, todo o nada"""
+    assert db.bulk_agregar_ventas([(100, "Efectivo", "", "", ahora)] * 50) == 50
+    with pytest.raises((ValueError, DatabaseError)):
+        db.bulk_agregar_ventas([(100, "Efectivo", "", "", ahora), (-5, "Efectivo", "", "", ahora)])
+    assert db.obtener_resumen_diario(ahora.strftime('%Y-%m-%d'))['cantidad'] == 50
+
+
+def test_resumen_refleja_escrituras(db_con_ventas, ahora):
+    """Test: El resumen cacheado se actualiza tras una nueva venta"""
+    fecha = ahora.strftime('%Y-%m-%d')
+    antes = db_con_ventas.obtener_resumen_diario(fecha)
+    db_con_ventas.agregar_venta(monto=250, forma_pago="Efectivo", fecha_hora=ahora)
+    despues = db_con_ventas.obtener_resumen_diario(fecha)
+    assert despues['cantidad'] == antes['cantidad'] + 1, "El resumen no refleja la nueva venta"
+    assert abs(despues['total'] - antes['total'] - 250) < 0.01
+
+
+def test_cache_resumenes_acotada(db):
+    """Test: Consultar muchas fechas distintas no hace crecer la caché sin límite"""
+    for dia in range(1, 21):
+        db.obtener_resumen_diario(f"2025-01-{dia:02d}")
+    assert len(db._query_cache) <= 8
+
+
+# ==========================================
+# TESTS DE CLIENTES
+# ==========================================
+@pytest.fixture
+def cliente_juan(db):
+    """Cliente de prueba ya registrado; devuelve su nombre"""
+    nombre = NOMBRE_JUAN
+    db.agregar_cliente(
+        nombre=nombre,
+        telefono="1234567890",
+        email="juan@test.com",
+        direccion="Calle Test 123",
+        notas="Cliente de prueba"
+    )
+    return nombre
+
+
+def test_crear_cliente(db):
+    """Test: Crear un cliente nuevo"""
+    cliente_id = db.agregar_cliente(
+        nombre=NOMBRE_JUAN,
+        telefono="1234567890",
+        email="juan@test.com",
+        direccion="Calle Test 123",
+        notas="Cliente de prueba"
+    )
+    assert cliente_id is not None, "No se retornó ID de cliente"
+    assert cliente_id > 0, f"ID de cliente inválido: {cliente_id}"
+
+
+@pytest.mark.parametrize("formato", ["{}", "  {}  ", "{}\n"])
+def test_crear_cliente_duplicado(db, cliente_juan, formato):
+    """Test: Intentar crear cliente duplicado (el nombre se guarda sin espacios alrededor)"""
+    with pytest.raises((ValueError, DatabaseError)):
+        db.agregar_cliente(nombre=formato.format(cliente_juan))
+
+
+def test_obtener_clientes(db, cliente_juan):
+    """Test: Obtener lista de clientes"""
+    clientes = db.obtener_clientes()
+    assert len(clientes) > 0, "No se encontraron clientes"
+    nombres = {c['nombre'] for c in clientes}
+    assert cliente_juan in nombres, "No se encontró cliente de prueba"
+
+
+def test_existe_cliente(db, cliente_juan):
+    """Test: Consultar si un nombre de cliente ya está registrado"""
+    assert db.existe_cliente(cliente_juan)
+    assert db.existe_cliente(f"  {cliente_juan} ")
+    assert not db.existe_cliente(NOMBRE_MARIA)
+
+
+def test_buscar_cliente_por_nombre(db, cliente_juan):
+    """Test: Buscar cliente por nombre"""
+    cliente = db.buscar_cliente_por_nombre(cliente_juan)
+    assert cliente is not None, "No se encontró cliente"
+    assert cliente['nombre'] == cliente_juan
+
+
+# ==========================================
+# TESTS DE FIADOS
+# ==========================================
+def test_transaccion_revierte_todo(db, ahora):
+    """Test: Una excepción dentro de transaction() deshace todas las escrituras del bloque"""
+    fecha = ahora.strftime('%Y-%m-%d')
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            db.agregar_venta(monto=100, forma_pago="Efectivo", fecha_hora=ahora)
+            db.agregar_cliente(nombre=NOMBRE_JUAN)
+            # Una lectura dentro del bloque no debe dejar en caché filas que se descartan
+            assert db.obtener_resumen_diario(fecha)['cantidad'] == 1
+            raise RuntimeError("abortar")
+    assert db.obtener_resumen_diario(fecha)['cantidad'] == 0
+    assert db.buscar_cliente_por_nombre(NOMBRE_JUAN) is None
+
+
+@pytest.fixture(scope="class")
+def flujo():
+    """Base de datos compartida por TestFlujoFiado y los ids creados en el camino"""
+    database = Database(path=MEMORY_PATH, testing=True)
+    yield {'db': database}
+    database.close()
+
+
+@pytest.mark.xdist_group(name="fiado_chain")
+class TestFlujoFiado:
+    """Ciclo de vida de un fiado: los tests comparten base de datos y corren en orden en un mismo worker"""
+
+    def test_crear_fiado(self, flujo):
         """Test: Crear un fiado"""
-        # Primero crear un cliente para el fiado
-        cliente_id = self.db.agregar_cliente(
-            nombre=f"María García {self.test_suffix}", 
-            telefono="0987654321"
-        )
-        self.test_cliente_fiado_id = cliente_id
-        
-        fiado_id = self.db.agregar_fiado(
-            cliente_id=cliente_id,
-            cliente_nombre=f"María García {self.test_suffix}",
-            monto=3500,
-            interes=10,
-            nota="Fiado de prueba"
-        )
+        db = flujo['db']
+        # Cliente y fiado se confirman juntos en un solo commit
+        with db.transaction():
+            cliente_id = db.agregar_cliente(
+                nombre=NOMBRE_MARIA,
+                telefono="0987654321"
+            )
+            fiado_id = db.agregar_fiado(
+                cliente_id=cliente_id,
+                cliente_nombre=NOMBRE_MARIA,
+                monto=3500,
+                interes=10,
+                nota="Fiado de prueba"
+            )
+        flujo['cliente_id'] = cliente_id
+
         assert fiado_id is not None, "No se retornó ID de fiado"
         assert fiado_id > 0, f"ID de fiado inválido: {fiado_id}"
-        self.test_fiado_id = fiado_id
-        
+        flujo['fiado_id'] = fiado_id
+
         # Verificar que se calculó correctamente
-        fiados = self.db.obtener_fiados()
-        fiado = next((f for f in fiados if f['id'] == fiado_id), None)
+        fiado = db.obtener_fiado(fiado_id)
         assert fiado is not None, "No se encontró fiado creado"
         assert fiado['monto_total'] == 3850.00, f"Monto total incorrecto: {fiado['monto_total']} (esperado: 3850.00)"
         assert fiado['estado'] == 'Pendiente', f"Estado incorrecto: {fiado['estado']}"
-        
-    def test_pago_parcial_fiado(self):
+
+    def test_pago_parcial_fiado(self, flujo):
         """Test: Registrar pago parcial de fiado"""
         # Pagar $1000 de $3850
-        resultado = self.db.registrar_pago_fiado(self.test_fiado_id, 1000)
+        resultado = flujo['db'].registrar_pago_fiado(flujo['fiado_id'], 1000)
         assert resultado['completado'] == False, "No debería estar completado"
         assert resultado['estado'] == 'Parcial', f"Estado incorrecto: {resultado['estado']}"
         assert resultado['saldo_restante'] == 2850.00, f"Saldo incorrecto: {resultado['saldo_restante']}"
-        
-    def test_pago_completo_fiado(self):
+
+    def test_saldo_pendiente_cliente(self, flujo):
+        """Test: Saldo pendiente y fiados abiertos de un cliente"""
+        db = flujo['db']
+        saldo = db.obtener_saldo_pendiente_cliente(flujo['cliente_id'])
+        assert abs(saldo - 2850.00) < 0.01, f"Saldo incorrecto: {saldo}"
+        abiertos = db.obtener_fiados(cliente_id=flujo['cliente_id'], solo_pendientes=True)
+        assert [f['id'] for f in abiertos] == [flujo['fiado_id']]
+        assert db.obtener_fiado(flujo['fiado_id'] + 1) is None
+
+    def test_pago_completo_fiado(self, flujo):
         """Test: Completar pago de fiado"""
         # Pagar los $2850 restantes
-        resultado = self.db.registrar_pago_fiado(self.test_fiado_id, 2850)
+        resultado = flujo['db'].registrar_pago_fiado(flujo['fiado_id'], 2850)
         assert resultado['completado'] == True, "Debería estar completado"
         assert resultado['estado'] == 'Pagado', f"Estado incorrecto: {resultado['estado']}"
         assert resultado['saldo_restante'] == 0.00, f"Saldo debería ser 0.00: {resultado['saldo_restante']}"
-        
-    def test_obtener_fiados(self):
+
+    def test_obtener_fiados(self, flujo):
         """Test: Obtener lista de fiados"""
-        fiados = self.db.obtener_fiados()
+        fiados = flujo['db'].obtener_fiados()
         assert len(fiados) > 0, "No se encontraron fiados"
-        
-    def test_obtener_fiados_por_estado(self):
+
+    def test_obtener_fiados_por_estado(self, flujo):
         """Test: Filtrar fiados por estado"""
-        fiados_pagados = self.db.obtener_fiados(estado='Pagado')
+        fiados_pagados = flujo['db'].obtener_fiados(estado='Pagado')
         assert len(fiados_pagados) > 0, "No se encontraron fiados pagados"
-        
-    def test_historial_pagos_fiado(self):
+
+    def test_historial_pagos_fiado(self, flujo):
         """Test: Obtener historial de pagos de un fiado"""
-        historial = self.db.obtener_historial_fiado(self.test_fiado_id)
+        historial = flujo['db'].obtener_historial_fiado(flujo['fiado_id'])
         assert len(historial) == 2, f"Se esperaban 2 pagos, hay {len(historial)}"
-        
-    def test_estadisticas_fiados(self):
+
+    def test_estadisticas_fiados(self, flujo):
         """Test: Obtener estadísticas de fiados"""
-        stats = self.db.obtener_estadisticas_fiados()
-        assert 'total' in stats
-        assert 'pagados' in stats
-        assert 'saldo_pendiente' in stats
+        stats = flujo['db'].obtener_estadisticas_fiados()
+        faltantes = {'total', 'pagados', 'saldo_pendiente'} - stats.keys()
+        assert not faltantes, f"Faltan keys: {faltantes}"
         assert stats['total'] > 0
-        
-    # ==========================================
-    # TESTS DE RESUMENES Y REPORTES
-    # ==========================================
-    def test_exportar_datos(self):
-        """Test: Exportar datos a JSON"""
-        datos = self.db.exportar_a_json()
-        assert 'ventas' in datos
-        assert 'fiados' in datos
-        assert 'exportado_el' in datos
-        assert len(datos['ventas']) >= 2
-        
-    # ==========================================
-    # RUN ALL TESTS
-    # ==========================================
-    def run_all_tests(self):
-        """Ejecutar todas las pruebas"""
-        print("\n" + "="*70)
-        print("   TEST SUITE COMPLETO - KIOSCO MANAGER")
-        print("="*70 + "\n")
-        
-        if not self.setup():
-            return False
-        
-        # TESTS DE VENTAS
-        print("[SECCION] TESTS DE VENTAS")
-        print("-" * 70)
-        
-        self.run_test("Crear venta basica", self.test_crear_venta)
-        self.run_test("Crear venta sin cliente", self.test_crear_venta_sin_cliente)
-        self.run_test("Validar monto invalido", self.test_crear_venta_monto_invalido)
-        self.run_test("Obtener ventas de hoy", self.test_obtener_ventas_hoy)
-        self.run_test("Obtener ventas por fecha", self.test_obtener_ventas_por_fecha)
-        self.run_test("Resumen mensual", self.test_resumen_mensual)
-        
-        # TESTS DE CLIENTES
-        print("\n[SECCION] TESTS DE CLIENTES")
-        print("-" * 70)
-        
-        self.run_test("Crear cliente", self.test_crear_cliente)
-        self.run_test("Validar cliente duplicado", self.test_crear_cliente_duplicado)
-        self.run_test("Obtener clientes", self.test_obtener_clientes)
-        self.run_test("Buscar cliente por nombre", self.test_buscar_cliente_por_nombre)
-        
-        # TESTS DE FIADOS
-        print("\n[SECCION] TESTS DE FIADOS")
-        print("-" * 70)
-        
-        self.run_test("Crear fiado", self.test_crear_fiado)
-        self.run_test("Pago parcial de fiado", self.test_pago_parcial_fiado)
-        self.run_test("Pago completo de fiado", self.test_pago_completo_fiado)
-        self.run_test("Obtener fiados", self.test_obtener_fiados)
-        self.run_test("Filtrar fiados por estado", self.test_obtener_fiados_por_estado)
-        self.run_test("Historial de pagos", self.test_historial_pagos_fiado)
-        self.run_test("Estadisticas de fiados", self.test_estadisticas_fiados)
-        
-        # TESTS DE REPORTES
-        print("\n[SECCION] TESTS DE REPORTES")
-        print("-" * 70)
-        
-        self.run_test("Exportar datos", self.test_exportar_datos)
-        
-        # RESULTADOS
-        self.print_results()
-        
-        return self.tests_failed == 0
-    
-    def print_results(self):
-        """Imprimir resultados finales"""
-        print("\n" + "="*70)
-        print("   RESULTADOS DE PRUEBAS")
-        print("="*70 + "\n")
-        
-        total = self.tests_passed + self.tests_failed
-        print(f"Total de tests: {total}")
-        print(f"{TestColors.OK} Pasados: {self.tests_passed}")
-        print(f"{TestColors.FAIL} Fallidos: {self.tests_failed}")
-        print(f"Tasa de exito: {(self.tests_passed/total)*100:.1f}%\n")
-        
-        if self.tests_failed > 0:
-            print(f"{TestColors.FAIL} Tests fallidos:")
-            for name, passed, error in self.test_results:
-                if not passed:
-                    print(f"  - {name}: {error}")
-            print()
-        
-        if self.tests_failed == 0:
-            print(f"{TestColors.OK} TODOS LOS TESTS PASARON EXITOSAMENTE")
-        else:
-            print(f"{TestColors.WARNING} ALGUNOS TESTS FALLARON - REVISAR")
-        
-        print("\n" + "="*70 + "\n")
+
+
+# ==========================================
+# TESTS DE RESUMENES Y REPORTES
+# ==========================================
+def test_exportar_datos(db_con_ventas):
+    """Test: Exportar datos a JSON"""
+    datos = db_con_ventas.exportar_a_json()
+    assert 'ventas' in datos
+    assert 'fiados' in datos
+    assert 'exportado_el' in datos
+    assert len(datos['ventas']) == 2
+
+
+def test_exportar_datos_stream(db_con_ventas):
+    """Test: Exportar datos a JSON en streaming"""
+    buffer = io.StringIO()
+    resumen = db_con_ventas.exportar_a_json_stream(buffer)
+    datos = json.loads(buffer.getvalue())
+    completo = db_con_ventas.exportar_a_json()
+    assert datos['ventas'] == completo['ventas']
+    assert datos['fiados'] == completo['fiados']
+    assert datos['resumen'] == resumen
+    assert resumen['total_ventas'] == completo['resumen']['total_ventas']
+    assert abs(resumen['monto_total_ventas'] - completo['resumen']['monto_total_ventas']) < 0.01
+
+
+def test_exportar_stream_instantanea_unica(tmp_path, ahora):
+    """Test: Una venta confirmada a mitad de la exportación no desfasa filas y totales"""
+    ruta = tmp_path / "kiosco.db"
+    # Sin testing=True: la exportación concurrente depende del modo WAL de producción
+    db = Database(path=ruta)
+    otra = Database(path=ruta)
+    db.agregar_venta(monto=100, forma_pago="Efectivo", fecha_hora=ahora)
+
+    class EscrituraConcurrente(io.StringIO):
+        """Registra una venta desde otra conexión al empezar a escribir los fiados"""
+        def write(self, texto):
+            if texto.startswith('  "fiados"'):
+                otra.agregar_venta(monto=999, forma_pago="Efectivo", fecha_hora=ahora)
+            return super().write(texto)
+
+    buffer = EscrituraConcurrente()
+    resumen = db.exportar_a_json_stream(buffer)
+    datos = json.loads(buffer.getvalue())
+    assert resumen['total_ventas'] == len(datos['ventas']) == 1
+    assert abs(resumen['monto_total_ventas'] - sum(v['monto'] for v in datos['ventas'])) < 0.01
+    db.close()
+    otra.close()
+
+
+def test_resumen_anual(db_con_ventas, ahora):
+    """Test: Obtener resumen anual"""
+    datos = db_con_ventas.obtener_resumen_anual(ahora.year)
+    assert len(datos['por_mes']) == 1, "Se esperaba un solo mes con ventas"
+    assert datos['cantidad'] == 2, f"Se esperaban 2 ventas, hay {datos['cantidad']}"
+    assert datos['total'] == sum(m['total'] for m in datos['por_mes'])
+
 
 if __name__ == "__main__":
-    tester = KioscoTester()
-    success = tester.run_all_tests()
-    sys.exit(0 if success else 1)
+    sys.exit(pytest.main([__file__, *sys.argv[1:]]))